@@ -1,23 +1,41 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 import os
-import torch
 from PIL import Image
-from sentence_transformers import SentenceTransformer, util
-from transformers import CLIPProcessor, CLIPModel
 import pdfplumber
 from docx import Document
 import pickle
+import json
+import time
+import uuid
 import tempfile
 import requests
-from datetime import datetime
+from datetime import datetime, timezone
+from contextlib import ExitStack
 import io
 from urllib.parse import urlparse
 import weaviate
-from weaviate.classes.init import Auth
 from weaviate.classes.query import MetadataQuery
+from werkzeug.exceptions import RequestEntityTooLarge
 import numpy as np
 
+import duplicates
+import lanes
+import logs
+import metrics
+import profiling
+import result_cache
+import search_query
+import snapshot
+from model_registry import ModelError, ModelUnavailable, load_config, registry
+from weaviate_connection import WeaviateConnection, WeaviateUnavailable
+
+download_log = logs.get_logger('download')
+embed_log = logs.get_logger('embed')
+search_log = logs.get_logger('search')
+batch_log = logs.get_logger('batch')
+weaviate_log = logs.get_logger('weaviate')
+
 # Suppress tokenizers warning
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
@@ -25,6 +43,16 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+@app.before_request
+def assign_request_id():
+    """Tag every log record of this request with a request id"""
+    logs.start_request(request.headers.get('X-Request-ID'))
+
+@app.after_request
+def return_request_id(response):
+    response.headers['X-Request-ID'] = logs.request_id.get()
+    return response
+
 # Configuration
 TEMP_FOLDER = 'temp_files'
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -34,35 +62,27 @@ os.makedirs(TEMP_FOLDER, exist_ok=True)
 
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
+# Snapshot uploads are streamed to disk and may be much larger than a file
+SNAPSHOT_MAX_BYTES = int(os.environ.get('SNAPSHOT_MAX_MB', 4096)) * 1024 * 1024
+
 # Weaviate Configuration
 WEAVIATE_URL = os.environ.get('WEAVIATE_URL', 'http://localhost:8080')
 WEAVIATE_API_KEY = os.environ.get('WEAVIATE_API_KEY', None)
 
-# Initialize Weaviate client
-try:
-    if WEAVIATE_API_KEY:
-        weaviate_client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=WEAVIATE_URL,
-            auth_credentials=Auth.api_key(WEAVIATE_API_KEY)
-        )
-    else:
-        # Parse host and port from URL for local connection
-        parsed_url = urlparse(WEAVIATE_URL)
-        host = parsed_url.hostname or 'localhost'
-        port = parsed_url.port or 8080
-        weaviate_client = weaviate.connect_to_local(
-            host=host,
-            port=port
-        )
-    print("Connected to Weaviate successfully")
-except Exception as e:
-    print(f"Error connecting to Weaviate: {e}")
-    weaviate_client = None
+# Weaviate client, connected lazily in each worker (see weaviate_connection.py)
+weaviate_client = WeaviateConnection(WEAVIATE_URL, WEAVIATE_API_KEY)
+
+def weaviate_unavailable():
+    """503 response while the Weaviate circuit breaker is open"""
+    response = jsonify({'error': 'Weaviate unavailable, retry later'})
+    response.headers['Retry-After'] = str(max(1, round(weaviate_client.breaker.retry_after())))
+    return response, 503
 
 # Allowed file extensions
+SUPPORTED_FORMATS = load_config().get('supported_formats', {})
 ALLOWED_EXTENSIONS = {
-    'image': {'jpg', 'jpeg', 'png', 'bmp', 'webp'},
-    'text': {'pdf', 'docx', 'txt', 'md'}
+    'image': set(SUPPORTED_FORMATS.get('images', ['jpg', 'jpeg', 'png', 'bmp', 'webp'])),
+    'text': set(SUPPORTED_FORMATS.get('documents', ['pdf', 'docx', 'txt', 'md']))
 }
 
 def is_allowed_file_type(filename):
@@ -81,82 +101,103 @@ def is_allowed_file_type(filename):
     for extensions in ALLOWED_EXTENSIONS.values():
         all_extensions.update(extensions)
     
-    print(f"Checking file type for '{filename}', extension: '{ext}', allowed: {ext in all_extensions}")
+    download_log.debug("Checked file type", extra=logs.per_file(file=filename, extension=ext, allowed=ext in all_extensions))
     return ext in all_extensions
 
-# Initialize AI models
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"Using device: {device}")
-
-# Model cache directory
-MODEL_CACHE_DIR = os.path.join(os.path.dirname(__file__), "models")
-os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
-
-# Load CLIP for images
-clip_cache_dir = os.path.join(MODEL_CACHE_DIR, "clip-vit-base-patch32")
-print("Loading CLIP model...")
-try:
-    clip_model = CLIPModel.from_pretrained(
-        "openai/clip-vit-base-patch32",
-        cache_dir=clip_cache_dir
-    ).to(device)
-    clip_processor = CLIPProcessor.from_pretrained(
-        "openai/clip-vit-base-patch32",
-        cache_dir=clip_cache_dir,
-        use_fast=True
-    )
-    print("CLIP model loaded successfully")
-except Exception as e:
-    print(f"Error loading CLIP model: {e}")
-    raise
-
-# Load Sentence-BERT for text
-sbert_cache_dir = os.path.join(MODEL_CACHE_DIR, "all-MiniLM-L6-v2")
-print("Loading SentenceTransformer model...")
-try:
-    text_model = SentenceTransformer(
-        "all-MiniLM-L6-v2",
-        cache_folder=sbert_cache_dir
-    ).to(device)
-    print("SentenceTransformer model loaded successfully")
-except Exception as e:
-    print(f"Error loading SentenceTransformer model: {e}")
-    raise
-
-print("All models loaded successfully!")
-
-def create_weaviate_collection(collection_name):
+# AI models are loaded lazily by the registry (see model_registry.py and config.json)
+device = registry.device
+logs.get_logger('models').info("Using device", extra={'device': device})
+
+def collection_exists(collection_name):
+    """True if a collection exists; raises WeaviateUnavailable if Weaviate cannot be reached"""
+    with weaviate_client.guard():
+        return weaviate_client.collections.exists(collection_name)
+
+# Collection manifests cached per worker: {collection_name: (manifest, fetched_at, property_names)}
+_manifest_cache = {}
+
+def _load_collection(collection_name):
+    """Fetch and cache a collection's manifest and property names, or None if it does not exist"""
+    cached = _manifest_cache.get(collection_name)
+    if cached and time.monotonic() - cached[1] < registry.manifest_cache_seconds:
+        return cached
+    
+    if not collection_exists(collection_name):
+        return None
+    
+    with weaviate_client.guard():
+        config = weaviate_client.collections.get(collection_name).config.get()
+    try:
+        manifest = json.loads(config.description or '')
+        manifest['image'], manifest['text']
+    except (ValueError, KeyError, TypeError):
+        # Collections created before manifests were recorded
+        manifest = registry.legacy_manifest()
+    
+    _manifest_cache[collection_name] = (manifest, time.monotonic(), [p.name for p in config.properties or []])
+    return _manifest_cache[collection_name]
+
+def get_collection_manifest(collection_name):
+    """Return the models that built a collection's vectors, or None if it does not exist"""
+    cached = _load_collection(collection_name)
+    return cached[0] if cached else None
+
+def get_collection_properties(collection_name):
+    """Return the property names of a collection's schema, or [] if it does not exist"""
+    cached = _load_collection(collection_name)
+    return cached[2] if cached else []
+
+def check_requested_models(collection_name, manifest, image_model=None, text_model=None):
+    """Raise ModelError if a request asks for models other than the collection's"""
+    for modality, requested in (('image', image_model), ('text', text_model)):
+        if requested and registry.resolve(manifest[modality]) != requested:
+            raise ModelError(
+                f"Collection {collection_name} was built with {modality} model "
+                f"'{manifest[modality]['model_name']}', not '{requested}'"
+            )
+
+def create_weaviate_collection(collection_name, manifest):
     """Create a Weaviate collection for storing embeddings"""
     try:
         
-        if weaviate_client and not weaviate_client.collections.exists(collection_name):
-            from weaviate.classes.config import Property, DataType, Configure
+        if weaviate_client and not collection_exists(collection_name):
+            from weaviate.classes.config import Property, DataType, Configure, Tokenization
             
-            weaviate_client.collections.create(
-                name=collection_name,
-                properties=[
-                    Property(name="filename", data_type=DataType.TEXT),
-                    Property(name="url", data_type=DataType.TEXT),
-                    Property(name="type", data_type=DataType.TEXT),
-                    Property(name="text_preview", data_type=DataType.TEXT),
-                    Property(name="timestamp", data_type=DataType.TEXT),
-                ],
-                # Use named vectors to support different dimensions
-                vectorizer_config=[
-                    Configure.NamedVectors.none(
-                        name="image_vector",
-                        vector_index_config=Configure.VectorIndex.hnsw()
-                    ),
-                    Configure.NamedVectors.none(
-                        name="text_vector",
-                        vector_index_config=Configure.VectorIndex.hnsw()
-                    )
+            properties = [
+                # Whole-value tokenization so filename_pattern matches the full name
+                Property(name="filename", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+                Property(name="url", data_type=DataType.TEXT),
+                Property(name="type", data_type=DataType.TEXT),
+                Property(name="text_preview", data_type=DataType.TEXT),
+                Property(name="timestamp", data_type=DataType.TEXT),
+                # Filterable embed time for created_after / created_before
+                Property(name="created_at", data_type=DataType.DATE),
+            ]
+            with weaviate_client.guard():
+                weaviate_client.collections.create(
+                    name=collection_name,
+                    # The manifest records which models produce this collection's vectors
+                    description=json.dumps(manifest),
+                    properties=properties,
+                    # Use named vectors to support different dimensions
+                    vectorizer_config=[
+                        Configure.NamedVectors.none(
+                            name="image_vector",
+                            vector_index_config=Configure.VectorIndex.hnsw()
+                        ),
+                        Configure.NamedVectors.none(
+                            name="text_vector",
+                            vector_index_config=Configure.VectorIndex.hnsw()
+                        )
                 ]
             )
-            print(f"Created Weaviate collection: {collection_name}")
+            _manifest_cache[collection_name] = (manifest, time.monotonic(), [p.name for p in properties])
+            weaviate_log.info("Created Weaviate collection", extra={'collection': collection_name})
         return collection_name
+    except WeaviateUnavailable:
+        raise
     except Exception as e:
-        print(f"Error creating Weaviate collection: {e}")
+        weaviate_log.error("Error creating Weaviate collection", extra={'collection': collection_name, 'error': str(e)})
         return None
 
 # Helper functions
@@ -167,9 +208,10 @@ def download_file_from_url(url, temp_dir):
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        print(f"Downloading file from URL: {url}")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
+        download_log.debug("Downloading file", extra=logs.per_file(url=url))
+        with metrics.time_stage('download'):
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
         
         # Get filename from URL or use a default
         parsed_url = urlparse(url)
@@ -215,15 +257,15 @@ def download_file_from_url(url, temp_dir):
                 filename = f"file_{timestamp}.{ext}"
         
         filepath = os.path.join(temp_dir, filename)
-        print(f"Saving file as: {filename}")
+        download_log.debug("Saving file", extra=logs.per_file(file=filename))
         
         with open(filepath, 'wb') as f:
             f.write(response.content)
         
-        print(f"Successfully downloaded: {filename}")
+        download_log.info("Downloaded file", extra=logs.per_file(file=filename, bytes=len(response.content)))
         return filepath, filename
     except Exception as e:
-        print(f"Error downloading file from {url}: {e}")
+        download_log.warning("Error downloading file", extra={'url': url, 'error': str(e)})
         return None, None
 
 def extract_text(file_path):
@@ -242,154 +284,255 @@ def extract_text(file_path):
         else:
             return None
     except Exception as e:
-        print(f"Error extracting text from {file_path}: {e}")
+        embed_log.warning("Error extracting text", extra={'file': os.path.basename(file_path), 'error': str(e)})
         return None
 
-def embed_and_store_file(file_path, file_url, collection_name):
-    """Create embeddings for a file and store in Weaviate"""
+def embed_and_store_file(file_path, file_url, collection_name, manifest):
+    """Create embeddings for a file with the collection's models and store in Weaviate"""
     ext = file_path.lower().split(".")[-1]
     filename = os.path.basename(file_path)
     timestamp = datetime.now().isoformat()
 
     try:
         collection = weaviate_client.collections.get(collection_name)
+        # Collections created before created_at was recorded do not have the property
+        dated = {"created_at": datetime.now(timezone.utc)} if 'created_at' in get_collection_properties(collection_name) else {}
         
         # Check if file with this URL already exists
-        existing = collection.query.fetch_objects(
-            filters=weaviate.classes.query.Filter.by_property("url").equal(file_url),
-            limit=1
-        )
+        with weaviate_client.guard(), metrics.time_stage('weaviate_query'):
+            existing = collection.query.fetch_objects(
+                filters=weaviate.classes.query.Filter.by_property("url").equal(file_url),
+                limit=1
+            )
         
         if existing.objects:
-            print(f"File already exists in collection, skipping: {filename}")
+            embed_log.info("File already exists in collection, skipping", extra=logs.per_file(file=filename))
             return "skipped"
         
-        if ext in {"jpg", "jpeg", "png", "bmp", "webp"}:
-            # Image Embedding using CLIP
-            image = Image.open(file_path).convert("RGB")
-            inputs = clip_processor(images=image, return_tensors="pt").to(device)
-            with torch.no_grad():
-                image_emb = clip_model.get_image_features(**inputs)
-            image_emb = image_emb / image_emb.norm(p=2)
+        if ext in ALLOWED_EXTENSIONS['image']:
+            # Image Embedding using the collection's image model (CLIP)
+            with metrics.time_stage('decode'):
+                image = Image.open(file_path).convert("RGB")
+            with registry.use(registry.resolve(manifest['image'])) as image_encoder:
+                with lanes.inference_slot('embed'), metrics.time_stage('clip_forward'):
+                    image_emb = image_encoder.encode_image(image)
             
             # Store in Weaviate with named vector
-            collection.data.insert(
-                properties={
-                    "filename": filename,
-                    "url": file_url,
-                    "type": "image",
-                    "text_preview": "",
-                    "timestamp": timestamp
-                },
-                vector={
-                    "image_vector": image_emb.cpu().numpy().flatten().tolist(),
-                    "text_vector": [0] * 384  # Dummy text vector
-                }
-            )
-            print(f"Image embedded and stored: {filename}")
-            return True
-
-        elif ext in {"pdf", "docx", "txt", "md"}:
-            # Text Embedding using BERT
-            text = extract_text(file_path)
-            if text:
-                text_emb = text_model.encode(text, convert_to_tensor=True)
-                
-                # Store in Weaviate with named vector
+            with weaviate_client.guard(), metrics.time_stage('weaviate_insert'):
                 collection.data.insert(
                     properties={
                         "filename": filename,
                         "url": file_url,
-                        "type": "text",
-                        "text_preview": text[:1000],
-                        "timestamp": timestamp
+                        "type": "image",
+                        "text_preview": "",
+                        "timestamp": timestamp,
+                        **dated
                     },
                     vector={
-                        "image_vector": [0] * 512,  # Dummy image vector
-                        "text_vector": text_emb.cpu().numpy().flatten().tolist()
+                        "image_vector": image_emb.cpu().numpy().flatten().tolist(),
+                        "text_vector": [0] * manifest['text']['dimension']  # Dummy text vector
                     }
                 )
-                print(f"Text embedded and stored: {filename}")
+            result_cache.invalidate(collection_name)
+            embed_log.info("Image embedded and stored", extra=logs.per_file(file=filename))
+            return True
+
+        elif ext in ALLOWED_EXTENSIONS['text']:
+            # Text Embedding using the collection's text model (SentenceTransformer)
+            with metrics.time_stage('extract'):
+                text = extract_text(file_path)
+            if text:
+                with registry.use(registry.resolve(manifest['text'])) as text_encoder:
+                    with lanes.inference_slot('embed'), metrics.time_stage('sbert_forward'):
+                        text_emb = text_encoder.encode_text(text)
+                
+                # Also place the text in CLIP space so /similar can match it against images
+                with registry.use(registry.resolve(manifest['image'])) as image_encoder:
+                    with lanes.inference_slot('embed'), metrics.time_stage('clip_forward'):
+                        clip_text_emb = image_encoder.encode_text(text)
+                
+                # Store in Weaviate with named vector
+                with weaviate_client.guard(), metrics.time_stage('weaviate_insert'):
+                    collection.data.insert(
+                        properties={
+                            "filename": filename,
+                            "url": file_url,
+                            "type": "text",
+                            "text_preview": text[:1000],
+                            "timestamp": timestamp,
+                            **dated
+                        },
+                        vector={
+                            "image_vector": clip_text_emb.cpu().numpy().flatten().tolist(),
+                            "text_vector": text_emb.cpu().numpy().flatten().tolist()
+                        }
+                    )
+                result_cache.invalidate(collection_name)
+                embed_log.info("Text embedded and stored", extra=logs.per_file(file=filename))
                 return True
             else:
-                print(f"Could not extract text: {filename}")
+                embed_log.warning("Could not extract text", extra={'file': filename})
+                metrics.record_file('failed', 'no_text')
                 return False
         else:
-            print(f"Unsupported file type: {filename}")
+            embed_log.warning("Unsupported file type", extra={'file': filename})
+            metrics.record_file('failed', 'unsupported_type')
             return False
+    except WeaviateUnavailable:
+        raise
     except Exception as e:
-        print(f"Error embedding file {filename}: {e}")
+        embed_log.error("Error embedding file", extra={'file': filename, 'error': str(e)})
+        metrics.record_file('failed', 'embed_error')
         return False
 
-def search_weaviate(query, collection_name, top_k=5):
-    """Search through Weaviate collection for relevant files"""
+def run_search(query, collection_name, depth, filters):
+    """Rank a collection's files for a query, down to depth results, in page order"""
+    manifest = get_collection_manifest(collection_name)
+    if manifest is None:
+        return []
+    file_types = search_query.file_types(filters)
+    # Filters run inside Weaviate, so only matching files are scored
+    property_names = get_collection_properties(collection_name)
+    where = {file_type: search_query.weaviate_filter(filters, file_type, property_names) for file_type in file_types}
+    
+    # Embed the query with the same models that built the collection:
+    # image files are searched with the CLIP embedding, text files with the text embedding
+    encoders = {
+        'image': (manifest['image'], 'clip_forward', "image_vector"),
+        'text': (manifest['text'], 'sbert_forward', "text_vector"),
+    }
+    queries = []
+    with ExitStack() as models:
+        encoder_for = {
+            file_type: models.enter_context(registry.use(registry.resolve(encoders[file_type][0])))
+            for file_type in file_types
+        }
+        # Hold one inference slot for both passes
+        with lanes.inference_slot('search'):
+            for file_type in file_types:
+                with metrics.time_stage(encoders[file_type][1]):
+                    query_emb = encoder_for[file_type].encode_text(query)
+                queries.append((collection_name, 'near_vector', {
+                    'near_vector': query_emb.cpu().numpy().flatten().tolist(),
+                    'target_vector': encoders[file_type][2],
+                    'limit': depth,
+                    'return_metadata': MetadataQuery(distance=True),
+                    'filters': where[file_type]
+                }))
+    
+    with metrics.time_stage('weaviate_query'):
+        responses = weaviate_client.fan_out(queries)
+    
+    # Combine, keeping the best score for each URL
+    all_results = {}
+    for response in responses:
+        for result in response.objects:
+            formatted = format_result(result)
+            previous = all_results.get(formatted["url"])
+            if previous is None or formatted["score"] > previous["score"]:
+                all_results[formatted["url"]] = formatted
+    
+    return search_query.rank(all_results.values())[:depth]
+
+def search_weaviate(query, collection_name, top_k=5, filters=None, position=None):
+    """Search through Weaviate collection for relevant files
+
+    Returns the top_k results after a cursor position and whether more follow.
+    """
+    filters = filters or {'type': 'all'}
+    depth = search_query.window_depth(position['n'] if position else 0, top_k)
     try:
-        collection = weaviate_client.collections.get(collection_name)
-        
-        # Process query for both image and text
-        clip_inputs = clip_processor(text=query, return_tensors="pt").to(device)
-        with torch.no_grad():
-            query_emb_img = clip_model.get_text_features(**clip_inputs)
-        query_emb_img = query_emb_img / query_emb_img.norm(p=2)
-        
-        query_emb_txt = text_model.encode(query, convert_to_tensor=True)
-        
-        # Search with image embeddings (for image files)
-        results_img = collection.query.near_vector(
-            near_vector=query_emb_img.cpu().numpy().flatten().tolist(),
-            target_vector="image_vector",
-            limit=top_k,
-            return_metadata=MetadataQuery(distance=True),
-            filters=weaviate.classes.query.Filter.by_property("type").equal("image")
+        # Pages of the same search are sliced from one cached ranking until the collection changes
+        ranking = result_cache.cached(
+            collection_name, 'search', {'query': query, 'filters': filters, 'depth': depth},
+            lambda: run_search(query, collection_name, depth, filters)
         )
-        
-        # Search with text embeddings (for text files)
-        results_txt = collection.query.near_vector(
-            near_vector=query_emb_txt.cpu().numpy().flatten().tolist(),
-            target_vector="text_vector",
-            limit=top_k,
-            return_metadata=MetadataQuery(distance=True),
-            filters=weaviate.classes.query.Filter.by_property("type").equal("text")
-        )
-        
-        # Combine and sort results
-        all_results = []
-        for result in results_img.objects:
-            score = 1 - result.metadata.distance  # Convert distance to similarity
-            all_results.append({
-                "score": score,
-                "type": result.properties["type"],
-                "filename": result.properties["filename"],
-                "url": result.properties["url"],
-                "excerpt": result.properties.get("text_preview", "")
-            })
-        
-        for result in results_txt.objects:
-            score = 1 - result.metadata.distance
-            # Check if already in results
-            if not any(r["url"] == result.properties["url"] for r in all_results):
-                all_results.append({
-                    "score": score,
-                    "type": result.properties["type"],
-                    "filename": result.properties["filename"],
-                    "url": result.properties["url"],
-                    "excerpt": result.properties.get("text_preview", "")
-                })
-        
-        # Sort by score and return top_k
-        all_results.sort(key=lambda x: x["score"], reverse=True)
-        return all_results[:top_k]
-        
+    except (ModelError, WeaviateUnavailable, search_query.FilterError):
+        raise
     except Exception as e:
-        print(f"Error searching Weaviate: {e}")
-        return []
+        search_log.error("Error searching Weaviate", extra={'collection': collection_name, 'error': str(e)})
+        return [], False
+    return search_query.page_after(ranking, top_k, position)
+
+def format_result(result):
+    """Convert a Weaviate result object to the API result format"""
+    return {
+        "id": str(result.uuid),
+        "score": 1 - result.metadata.distance,  # Convert distance to similarity
+        "type": result.properties["type"],
+        "filename": result.properties["filename"],
+        "url": result.properties["url"],
+        "excerpt": result.properties.get("text_preview", "")
+    }
+
+def find_similar(collection_name, file_url=None, object_id=None, top_k=5, cross_modal=False):
+    """Find files similar to an already-embedded file using its stored vectors
+
+    Returns (source, results, cross_modal_results), or (None, [], []) if the file
+    is not in the collection. Cross-modal matches get their own top_k: CLIP
+    image-text scores are far lower than same-modality scores, so they would
+    never make the cut in a merged list. No model inference is needed.
+    """
+    collection = weaviate_client.collections.get(collection_name)
+    
+    # Searches start from the source's stored vectors with near_object, so its
+    # vectors are only fetched when cross_modal has to check for placeholders
+    include_vector = ["image_vector"] if cross_modal else False
+    with weaviate_client.guard(), metrics.time_stage('weaviate_query'):
+        if object_id:
+            source = collection.query.fetch_object_by_id(object_id, include_vector=include_vector)
+        else:
+            response = collection.query.fetch_objects(
+                filters=weaviate.classes.query.Filter.by_property("url").equal(file_url),
+                limit=1,
+                include_vector=include_vector
+            )
+            source = response.objects[0] if response.objects else None
+    if source is None:
+        return None, [], []
+    
+    source_type = source.properties["type"]
+    # (named vector to search, type of files to match)
+    searches = [("image_vector" if source_type == "image" else "text_vector", source_type)]
+    if cross_modal:
+        # image_vector holds CLIP embeddings for both images and text files; text files
+        # embedded before CLIP text vectors were stored only have zeros there
+        clip_vector = source.vector.get("image_vector")
+        if clip_vector and any(clip_vector):
+            searches.append(("image_vector", "text" if source_type == "image" else "image"))
+    
+    queries = [(collection_name, 'near_object', {
+        'near_object': source.uuid,
+        'target_vector': target_vector,
+        # One extra in case the source file matches itself
+        'limit': top_k + 1,
+        'return_metadata': MetadataQuery(distance=True),
+        'filters': weaviate.classes.query.Filter.by_property("type").equal(match_type)
+    }) for target_vector, match_type in searches]
+    with metrics.time_stage('weaviate_query'):
+        responses = weaviate_client.fan_out(queries)
+    
+    ranked = []
+    for response in responses:
+        results = [format_result(result) for result in response.objects if str(result.uuid) != str(source.uuid)]
+        ranked.append(sorted(results, key=lambda x: x["score"], reverse=True)[:top_k])
+    
+    return {
+        "id": str(source.uuid),
+        "type": source_type,
+        "filename": source.properties["filename"],
+        "url": source.properties["url"]
+    }, ranked[0], ranked[1] if len(ranked) > 1 else []
 
 @app.route('/embed', methods=['POST'])
+@metrics.track_in_flight('embed')
+@profiling.profiled('embed')
+@lanes.lane('embed')
 def embed_endpoint():
     """Embed multiple files from URLs and store in Weaviate"""
     try:
         if not weaviate_client:
-            return jsonify({'error': 'Weaviate client not initialized'}), 500
+            return weaviate_unavailable()
         
         # Handle both JSON and form data
         if request.is_json:
@@ -399,14 +542,14 @@ def embed_endpoint():
             # Handle multiple URLs in form data
             if 'file_urls' in request.form:
                 data['file_urls'] = request.form.getlist('file_urls')
-
-        print(f"Received data: {data}")
         
         if not data:
             return jsonify({'error': 'JSON data or form data required'}), 400
         
         file_urls = data.get('file_urls', [])
         collection_name = data.get('collection_name', 'FileEmbeddings')
+        image_model = data.get('image_model')
+        text_model = data.get('text_model')
         
         # Handle single file_url for backward compatibility
         if not file_urls and data.get('file_url'):
@@ -415,8 +558,20 @@ def embed_endpoint():
         if not file_urls:
             return jsonify({'error': 'file_urls array is required'}), 400
         
-        # Create collection if it doesn't exist
-        collection_name = create_weaviate_collection(collection_name)
+        # Create collection if it doesn't exist, recording which models build it
+        try:
+            manifest = get_collection_manifest(collection_name)
+            if manifest is None:
+                manifest = registry.build_manifest(image_model, text_model)
+                collection_name = create_weaviate_collection(collection_name, manifest)
+            else:
+                check_requested_models(collection_name, manifest, image_model, text_model)
+        except ModelUnavailable as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+            return response, 503
+        except ModelError as e:
+            return jsonify({'error': str(e)}), 400
         if not collection_name:
             return jsonify({'error': 'Failed to create collection'}), 500
         
@@ -428,12 +583,15 @@ def embed_endpoint():
             
             # Process each file URL
             for i, file_url in enumerate(file_urls):
-                print(f"Processing file {i+1}/{len(file_urls)}: {file_url}")
+                # Let interactive searches go first
+                lanes.yield_to_interactive('embed')
+                embed_log.debug("Processing file", extra=logs.per_file(index=i + 1, total=len(file_urls), url=file_url))
                 try:
                     # Download the file to embed
                     file_path, filename = download_file_from_url(file_url, temp_dir)
                     if not file_path:
-                        print(f"Failed to download file {i+1}: {file_url}")
+                        embed_log.warning("Failed to download file", extra={'index': i + 1, 'url': file_url})
+                        metrics.record_file('failed', 'download')
                         failed_files.append({
                             'url': file_url,
                             'error': 'Failed to download file from URL'
@@ -441,8 +599,11 @@ def embed_endpoint():
                         continue
                     
                     # Check if file type is allowed
-                    if not is_allowed_file_type(filename):
-                        print(f"File type not supported for {filename}")
+                    with metrics.time_stage('type_check'):
+                        allowed = is_allowed_file_type(filename)
+                    if not allowed:
+                        embed_log.warning("File type not supported", extra={'file': filename})
+                        metrics.record_file('failed', 'file_type')
                         failed_files.append({
                             'url': file_url,
                             'error': 'File type not supported'
@@ -450,36 +611,45 @@ def embed_endpoint():
                         continue
                     
                     # Embed and store the file
-                    print(f"Embedding file: {filename}")
-                    result = embed_and_store_file(file_path, file_url, collection_name)
+                    embed_log.debug("Embedding file", extra=logs.per_file(file=filename))
+                    result = embed_and_store_file(file_path, file_url, collection_name, manifest)
                     if result == "skipped":
                         skipped_files.append({
                             'url': file_url,
                             'filename': filename,
                             'reason': 'File already exists in collection'
                         })
-                        print(f"Skipped existing file {filename}")
+                        metrics.record_file('skipped', 'duplicate')
                     elif result:
                         processed_files.append({
                             'url': file_url,
                             'filename': filename,
                             'status': 'success'
                         })
-                        print(f"Successfully processed {filename}")
+                        metrics.record_file('processed', 'embedded')
                     else:
                         failed_files.append({
                             'url': file_url,
                             'error': 'Failed to embed file'
                         })
                     
+                except WeaviateUnavailable:
+                    # Fail the whole request; files already stored are skipped on retry
+                    raise
                 except Exception as e:
-                    print(f"Error processing file {i+1}: {e}")
+                    embed_log.error("Error processing file", extra={'index': i + 1, 'url': file_url, 'error': str(e)})
+                    metrics.record_file('failed', 'error')
                     failed_files.append({
                         'url': file_url,
                         'error': str(e)
                     })
             
-            print(f"Processing complete: {len(processed_files)} successful, {len(skipped_files)} skipped, {len(failed_files)} failed")
+            embed_log.info("Processing complete", extra={
+                'collection': collection_name,
+                'processed': len(processed_files),
+                'skipped': len(skipped_files),
+                'failed': len(failed_files)
+            })
             
             return jsonify({
                 'collection_name': collection_name,
@@ -491,15 +661,20 @@ def embed_endpoint():
                 'total_failed': len(failed_files)
             })
             
+    except WeaviateUnavailable:
+        return weaviate_unavailable()
     except Exception as e:
         return jsonify({'error': f'Error embedding files: {str(e)}'}), 500
 
 @app.route('/search', methods=['POST'])
+@metrics.track_in_flight('search')
+@profiling.profiled('search')
+@lanes.lane('search')
 def search_endpoint():
     """Search through Weaviate collection and return file URLs"""
     try:
         if not weaviate_client:
-            return jsonify({'error': 'Weaviate client not initialized'}), 500
+            return weaviate_unavailable()
         
         # Handle both JSON and form data
         if request.is_json:
@@ -512,35 +687,137 @@ def search_endpoint():
         
         query = data.get('query')
         collection_name = data.get('collection_name', 'FileEmbeddings')
-        top_k = int(data.get('top_k', 5))
+        cursor = data.get('cursor')
 
         if not query:
             return jsonify({'error': 'query is required'}), 400
         
+        # top_k is the page size; filters and the cursor must match the search being paged
+        try:
+            try:
+                top_k = int(data.get('top_k', 5))
+            except (TypeError, ValueError):
+                raise ValueError("top_k must be an integer")
+            if top_k < 1:
+                raise ValueError("top_k must be at least 1")
+            filters = search_query.parse_filters(data)
+            key = search_query.search_key(collection_name, query, filters)
+            position = search_query.decode_cursor(cursor, key) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Search Weaviate
-        results = search_weaviate(query, collection_name, top_k)
+        try:
+            results, has_more = search_weaviate(query, collection_name, top_k, filters, position)
+        except ModelUnavailable as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+            return response, 503
+        except ModelError as e:
+            return jsonify({'error': str(e)}), 409
+        except search_query.FilterError as e:
+            return jsonify({'error': str(e)}), 400
 
-        print(f"Search completed. Found {len(results)} results for query: '{query}'")
+        served = (position['n'] if position else 0) + len(results)
+        next_cursor = search_query.encode_cursor(key, served, results[-1]) if has_more and results else None
+        search_log.info("Search completed", extra={
+            'collection': collection_name, 'top_k': top_k, 'results': len(results), 'offset': served - len(results)
+        })
         
         return jsonify({
             'query': query,
             'collection_name': collection_name,
+            'filters': filters,
             'results': results,
-            'total_results': len(results)
+            'total_results': len(results),
+            'next_cursor': next_cursor
         })
         
+    except WeaviateUnavailable:
+        return weaviate_unavailable()
     except Exception as e:
         return jsonify({'error': f'Error searching: {str(e)}'}), 500
 
+@app.route('/similar', methods=['POST'])
+@metrics.track_in_flight('similar')
+@profiling.profiled('similar')
+@lanes.lane('search')
+def similar_endpoint():
+    """Find files similar to an already-embedded file, without model inference"""
+    try:
+        if not weaviate_client:
+            return weaviate_unavailable()
+        
+        # Handle both JSON and form data
+        if request.is_json:
+            data = request.get_json()
+        else:
+            data = request.form.to_dict()
+        
+        if not data:
+            return jsonify({'error': 'JSON data or form data required'}), 400
+        
+        file_url = data.get('url')
+        object_id = data.get('id')
+        collection_name = data.get('collection_name', 'FileEmbeddings')
+        cross_modal = str(data.get('cross_modal', False)).lower() in ('1', 'true', 'yes')
+        
+        if not file_url and not object_id:
+            return jsonify({'error': 'url or id is required'}), 400
+        try:
+            try:
+                top_k = int(data.get('top_k', 5))
+            except (TypeError, ValueError):
+                raise ValueError("top_k must be an integer")
+            if top_k < 1:
+                raise ValueError("top_k must be at least 1")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if object_id:
+            try:
+                object_id = str(uuid.UUID(str(object_id)))
+            except ValueError:
+                return jsonify({'error': 'id must be a UUID'}), 400
+        
+        # Cached per worker, so usually no Weaviate round trip
+        if get_collection_manifest(collection_name) is None:
+            return jsonify({'error': f'Collection {collection_name} not found'}), 404
+        
+        source, results, cross_modal_results = find_similar(collection_name, file_url, object_id, top_k, cross_modal)
+        if source is None:
+            return jsonify({'error': 'File not found in collection'}), 404
+        
+        search_log.info("Similarity search completed", extra={
+            'collection': collection_name, 'source_id': source['id'],
+            'results': len(results), 'cross_modal_results': len(cross_modal_results)
+        })
+        
+        response = {
+            'source': source,
+            'collection_name': collection_name,
+            'cross_modal': cross_modal,
+            'results': results,
+            'total_results': len(results) + len(cross_modal_results)
+        }
+        if cross_modal:
+            response['cross_modal_results'] = cross_modal_results
+        return jsonify(response)
+        
+    except WeaviateUnavailable:
+        return weaviate_unavailable()
+    except Exception as e:
+        return jsonify({'error': f'Error finding similar files: {str(e)}'}), 500
+
 @app.route('/collections', methods=['GET'])
 def list_collections():
     """List all Weaviate collections"""
     try:
         if not weaviate_client:
-            return jsonify({'error': 'Weaviate client not initialized'}), 500
+            return weaviate_unavailable()
         
         # Get all collections - list_all() returns a dict with collection names as keys
-        all_collections = weaviate_client.collections.list_all()
+        with weaviate_client.guard():
+            all_collections = weaviate_client.collections.list_all()
         
         # Extract collection names
         if isinstance(all_collections, dict):
@@ -553,6 +830,8 @@ def list_collections():
             'collections': collections,
             'total': len(collections)
         })
+    except WeaviateUnavailable:
+        return weaviate_unavailable()
     except Exception as e:
         return jsonify({'error': f'Error listing collections: {str(e)}'}), 500
 
@@ -561,44 +840,253 @@ def manage_collection(collection_name):
     """Get details or delete a Weaviate collection"""
     try:
         if not weaviate_client:
-            return jsonify({'error': 'Weaviate client not initialized'}), 500
+            return weaviate_unavailable()
         
         if request.method == 'GET':
             # Get collection details
-            if not weaviate_client.collections.exists(collection_name):
+            if not collection_exists(collection_name):
                 return jsonify({'error': f'Collection {collection_name} not found'}), 404
 
             collection = weaviate_client.collections.get(collection_name)
             # Get object count
-            response = collection.aggregate.over_all(total_count=True)
+            with weaviate_client.guard():
+                response = collection.aggregate.over_all(total_count=True)
             count = response.total_count if response else 0
             
             return jsonify({
                 'name': collection_name,
                 'count': count,
-                'exists': True
+                'exists': True,
+                'models': get_collection_manifest(collection_name)
             })
         
         elif request.method == 'DELETE':
             # Delete collection
-            weaviate_client.collections.delete(collection_name)
+            with weaviate_client.guard():
+                weaviate_client.collections.delete(collection_name)
+            _manifest_cache.pop(collection_name, None)
+            result_cache.invalidate(collection_name)
             return jsonify({
                 'message': f'Collection {collection_name} deleted successfully'
             })
+    except WeaviateUnavailable:
+        return weaviate_unavailable()
     except Exception as e:
         return jsonify({'error': f'Error managing collection: {str(e)}'}), 500
 
+@app.route('/collections/<collection_name>/duplicates', methods=['GET', 'POST'])
+@metrics.track_in_flight('duplicates')
+@profiling.profiled('duplicates')
+@lanes.lane('batch')
+def duplicates_endpoint(collection_name):
+    """Find clusters of near-identical files in a collection"""
+    try:
+        if not weaviate_client:
+            return weaviate_unavailable()
+        
+        # Parameters from the query string or the request body
+        data = dict(request.args)
+        if request.method == 'POST':
+            data.update((request.get_json(silent=True) if request.is_json else request.form.to_dict()) or {})
+        
+        threshold = float(data.get('threshold', 0.95))
+        max_clusters = int(data.get('max_clusters', 100))
+        file_type = data.get('type', 'all')
+        
+        if not 0 < threshold <= 1:
+            return jsonify({'error': 'threshold must be in (0, 1]'}), 400
+        if file_type not in ('all', 'image', 'text'):
+            return jsonify({'error': "type must be 'image', 'text' or 'all'"}), 400
+        file_types = ('image', 'text') if file_type == 'all' else (file_type,)
+        
+        if not collection_exists(collection_name):
+            return jsonify({'error': f'Collection {collection_name} not found'}), 404
+        
+        collection = weaviate_client.collections.get(collection_name)
+        with weaviate_client.guard():
+            result = duplicates.find_duplicates(collection, threshold, file_types, max_clusters)
+        
+        batch_log.info("Duplicate scan completed", extra={
+            'collection': collection_name,
+            'scanned': result['scanned'],
+            'clusters': result['total_clusters'],
+            'seconds': round(result['elapsed_seconds'], 3)
+        })
+        
+        return jsonify({'collection_name': collection_name, **result})
+        
+    except duplicates.TooManyPairs as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
+    except WeaviateUnavailable:
+        return weaviate_unavailable()
+    except Exception as e:
+        return jsonify({'error': f'Error finding duplicates: {str(e)}'}), 500
+
+def remove_file(path):
+    """Delete a temporary file if it still exists"""
+    if os.path.exists(path):
+        os.remove(path)
+
+def drop_collection(collection_name):
+    """Delete a collection after a failed restore, logging rather than raising errors"""
+    try:
+        with weaviate_client.guard():
+            weaviate_client.collections.delete(collection_name)
+        _manifest_cache.pop(collection_name, None)
+    except Exception as e:
+        batch_log.error("Error removing partially restored collection", extra={'collection': collection_name, 'error': str(e)})
+
+def receive_snapshot(snapshot_path):
+    """Stream an uploaded snapshot (raw body or snapshot_url) to a file"""
+    if request.is_json:
+        snapshot_url = (request.get_json(silent=True) or {}).get('snapshot_url')
+        if not snapshot_url:
+            raise ValueError('Provide a snapshot file as the request body or a snapshot_url')
+        received = 0
+        with requests.get(snapshot_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            with open(snapshot_path, 'wb') as f:
+                for chunk in response.iter_content(snapshot.CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > SNAPSHOT_MAX_BYTES:
+                        raise ValueError(f'Snapshot is larger than {SNAPSHOT_MAX_BYTES // (1024 * 1024)}MB')
+                    f.write(chunk)
+        return
+    
+    # Lift the per-file upload limit for this request only
+    request.max_content_length = SNAPSHOT_MAX_BYTES
+    with open(snapshot_path, 'wb') as f:
+        while True:
+            chunk = request.stream.read(snapshot.CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+
+@app.route('/collections/<collection_name>/snapshot', methods=['GET', 'POST'])
+@metrics.track_in_flight('snapshot')
+@profiling.profiled('snapshot')
+@lanes.lane('batch')
+def snapshot_endpoint(collection_name):
+    """Export a collection to a binary snapshot (GET) or restore one into a new collection (POST)"""
+    snapshot_path = os.path.join(TEMP_FOLDER, f"snapshot_{uuid.uuid4().hex}.fsnap")
+    try:
+        if not weaviate_client:
+            return weaviate_unavailable()
+        
+        if request.method == 'GET':
+            manifest = get_collection_manifest(collection_name)
+            if manifest is None:
+                return jsonify({'error': f'Collection {collection_name} not found'}), 404
+            
+            dtype = request.args.get('dtype', 'float32')
+            if dtype not in snapshot.DTYPES:
+                return jsonify({'error': f"dtype must be one of {', '.join(snapshot.DTYPES)}"}), 400
+            
+            start = time.perf_counter()
+            with weaviate_client.guard():
+                footer = snapshot.export_collection(
+                    weaviate_client.collections.get(collection_name),
+                    collection_name, manifest, snapshot_path, dtype
+                )
+            batch_log.info("Exported snapshot", extra={
+                'collection': collection_name,
+                'objects': footer['count'],
+                'seconds': round(time.perf_counter() - start, 3)
+            })
+            
+            # Unlink right away; the open handle keeps the data until it has been sent
+            snapshot_file = open(snapshot_path, 'rb')
+            remove_file(snapshot_path)
+            response = send_file(
+                snapshot_file,
+                mimetype='application/octet-stream',
+                as_attachment=True,
+                download_name=f"{collection_name}.fsnap"
+            )
+            response.content_length = os.fstat(snapshot_file.fileno()).st_size
+            response.headers['X-Snapshot-Count'] = str(footer['count'])
+            response.headers['X-Snapshot-Sha256'] = footer['sha256']
+            return response
+        
+        if collection_exists(collection_name):
+            return jsonify({'error': f'Collection {collection_name} already exists'}), 409
+        
+        start = time.perf_counter()
+        receive_snapshot(snapshot_path)
+        restored = snapshot.Snapshot(snapshot_path)
+        
+        warnings = []
+        for modality in ('image', 'text'):
+            try:
+                registry.resolve(restored.manifest[modality])
+            except ModelError as e:
+                # The vectors are still usable for /similar and duplicates
+                warnings.append(f'{modality}: {str(e)}')
+        
+        if not create_weaviate_collection(collection_name, restored.manifest):
+            return jsonify({'error': f'Failed to create collection {collection_name}'}), 500
+        try:
+            with weaviate_client.guard():
+                result = snapshot.import_snapshot(weaviate_client.collections.get(collection_name), restored)
+        except Exception:
+            # Do not leave a half-restored collection behind
+            drop_collection(collection_name)
+            raise
+        finally:
+            result_cache.invalidate(collection_name)
+        elapsed = time.perf_counter() - start
+        
+        batch_log.info("Imported snapshot", extra={
+            'collection': collection_name,
+            'inserted': result['inserted'],
+            'failed': result['failed'],
+            'seconds': round(elapsed, 3)
+        })
+        
+        return jsonify({
+            'collection_name': collection_name,
+            'source_collection': restored.footer['collection'],
+            'inserted': result['inserted'],
+            'failed': result['failed'],
+            'models': restored.manifest,
+            'warnings': warnings,
+            'elapsed_seconds': elapsed
+        })
+    
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Snapshot too large. Maximum size is {SNAPSHOT_MAX_BYTES // (1024 * 1024)}MB'}), 413
+    except (ValueError, snapshot.SnapshotError) as e:
+        return jsonify({'error': f'Invalid snapshot: {str(e)}'}), 400
+    except WeaviateUnavailable:
+        return weaviate_unavailable()
+    except Exception as e:
+        return jsonify({'error': f'Error processing snapshot: {str(e)}'}), 500
+    finally:
+        # GET has already unlinked its export; this catches every other exit
+        remove_file(snapshot_path)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    weaviate_status = weaviate_client.is_ready() if weaviate_client else False
+    weaviate_status = bool(weaviate_client) and weaviate_client.is_ready()
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'models_loaded': True,
-        'weaviate_connected': weaviate_status
+        'loaded_models': registry.loaded(),
+        'weaviate_connected': weaviate_status,
+        'weaviate': weaviate_client.status(),
+        'log_records_dropped': logs.dropped()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    payload, content_type = metrics.render_latest()
+    return Response(payload, headers={'Content-Type': content_type})
+
 @app.errorhandler(413)
 def too_large(e):
     """Handle file too large error"""
@@ -0,0 +1,225 @@
+"""
+In-process stand-in for the parts of the Weaviate v4 client used by app.py
+
+Vectors live in numpy arrays and near_vector is an exact brute-force cosine
+search, so results are deterministic and no server is needed.
+"""
+
+import fnmatch
+import uuid as uuid_lib
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+from weaviate.collections.classes.filters import _FilterAnd, _FilterOr, _FilterValue, _Operator
+
+
+def _matches(filters, obj):
+    """Evaluate a Weaviate filter tree against a stored object"""
+    if filters is None:
+        return True
+    if isinstance(filters, _FilterAnd):
+        return all(_matches(f, obj) for f in filters.filters)
+    if isinstance(filters, _FilterOr):
+        return any(_matches(f, obj) for f in filters.filters)
+    if isinstance(filters, _FilterValue):
+        if filters.target == '_id':
+            actual = obj['uuid']
+        else:
+            actual = obj['properties'].get(filters.target)
+        expected = filters.value
+        op = filters.operator
+        if op == _Operator.EQUAL:
+            return actual == expected
+        if op == _Operator.NOT_EQUAL:
+            return actual != expected
+        if op == _Operator.LIKE:
+            return actual is not None and fnmatch.fnmatchcase(str(actual), str(expected))
+        if actual is None:
+            return False
+        if op == _Operator.GREATER_THAN:
+            return actual > expected
+        if op == _Operator.GREATER_THAN_EQUAL:
+            return actual >= expected
+        if op == _Operator.LESS_THAN:
+            return actual < expected
+        if op == _Operator.LESS_THAN_EQUAL:
+            return actual <= expected
+        if op == _Operator.CONTAINS_ANY:
+            return actual in expected
+    raise NotImplementedError(f"Filter not supported by fake Weaviate: {filters!r}")
+
+
+def _result(obj, distance=None, include_vector=False):
+    """Build a result object shaped like weaviate's Object"""
+    return SimpleNamespace(
+        uuid=obj['uuid'],
+        properties=dict(obj['properties']),
+        vector=dict(obj['vector']) if include_vector else {},
+        metadata=SimpleNamespace(distance=distance)
+    )
+
+
+class FakeQuery:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def fetch_objects(self, filters=None, limit=None, offset=None, after=None,
+                      include_vector=False, **kwargs):
+        """Return objects matching the filters in insertion order"""
+        objects = self._collection._objects
+        start = 0
+        if after is not None:
+            ids = [o['uuid'] for o in objects]
+            start = ids.index(str(after)) + 1
+        matched = [o for o in objects[start:] if _matches(filters, o)]
+        if offset:
+            matched = matched[offset:]
+        if limit is not None:
+            matched = matched[:limit]
+        return SimpleNamespace(objects=[_result(o, include_vector=include_vector) for o in matched])
+
+    def fetch_object_by_id(self, uuid, include_vector=False, **kwargs):
+        """Return a single object by id, or None"""
+        obj = self._collection._by_id.get(str(uuid))
+        return _result(obj, include_vector=include_vector) if obj else None
+
+    def near_vector(self, near_vector, target_vector=None, limit=None, offset=None,
+                    filters=None, include_vector=False, **kwargs):
+        """Exact cosine nearest-neighbour search over one named vector"""
+        candidates = [o for o in self._collection._objects if _matches(filters, o)]
+        if not candidates:
+            return SimpleNamespace(objects=[])
+        matrix = np.asarray([o['vector'][target_vector] for o in candidates], dtype=np.float32)
+        query = np.asarray(near_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        norms[norms == 0] = 1.0
+        distances = 1.0 - (matrix @ query) / norms
+        order = np.argsort(distances, kind='stable')
+        if offset:
+            order = order[offset:]
+        if limit is not None:
+            order = order[:limit]
+        return SimpleNamespace(objects=[
+            _result(candidates[i], float(distances[i]), include_vector) for i in order
+        ])
+
+
+    def near_object(self, near_object, target_vector=None, **kwargs):
+        """near_vector search from the stored vector of an object"""
+        obj = self._collection._by_id.get(str(near_object))
+        if obj is None:
+            return SimpleNamespace(objects=[])
+        return self.near_vector(obj['vector'][target_vector], target_vector=target_vector, **kwargs)
+
+class FakeData:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def insert(self, properties, vector=None, uuid=None, **kwargs):
+        """Store an object and return its id"""
+        object_id = str(uuid or uuid_lib.uuid4())
+        obj = {'uuid': object_id, 'properties': dict(properties), 'vector': dict(vector or {})}
+        self._collection._objects.append(obj)
+        self._collection._by_id[object_id] = obj
+        return object_id
+
+    def delete_many(self, where):
+        """Delete every object matching the filter"""
+        keep = [o for o in self._collection._objects if not _matches(where, o)]
+        deleted = len(self._collection._objects) - len(keep)
+        self._collection._objects[:] = keep
+        self._collection._by_id = {o['uuid']: o for o in keep}
+        return SimpleNamespace(successful=deleted, failed=0, matches=deleted)
+
+
+class FakeBatch:
+    def __init__(self, collection):
+        self._collection = collection
+        self.failed_objects = []
+
+    @contextmanager
+    def fixed_size(self, batch_size=100, concurrent_requests=2):
+        """Batch context whose add_object inserts immediately"""
+        self.failed_objects = []
+        yield SimpleNamespace(add_object=self._add_object, number_errors=0)
+
+    def _add_object(self, properties=None, references=None, uuid=None, vector=None):
+        return self._collection.data.insert(properties or {}, vector=vector, uuid=uuid)
+
+
+class FakeAggregate:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def over_all(self, total_count=True, **kwargs):
+        return SimpleNamespace(total_count=len(self._collection._objects))
+
+
+class FakeConfig:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def get(self, **kwargs):
+        return SimpleNamespace(
+            name=self._collection.name,
+            description=self._collection.description,
+            properties=[SimpleNamespace(name=name) for name in self._collection.property_names]
+        )
+
+
+class FakeCollection:
+    def __init__(self, name, description=None, property_names=()):
+        self.name = name
+        self.description = description
+        self.property_names = list(property_names)
+        self._objects = []
+        self._by_id = {}
+        self.query = FakeQuery(self)
+        self.data = FakeData(self)
+        self.batch = FakeBatch(self)
+        self.aggregate = FakeAggregate(self)
+        self.config = FakeConfig(self)
+
+    def __len__(self):
+        return len(self._objects)
+
+
+class FakeCollections:
+    def __init__(self):
+        self._collections = {}
+
+    def exists(self, name):
+        return name in self._collections
+
+    def create(self, name, description=None, properties=(), **kwargs):
+        self._collections[name] = FakeCollection(name, description, [p.name for p in properties])
+        return self._collections[name]
+
+    def get(self, name):
+        # Like the real client, a handle to a missing collection is empty
+        collection = self._collections.get(name)
+        return collection if collection is not None else FakeCollection(name)
+
+    def list_all(self, **kwargs):
+        return {name: SimpleNamespace(name=name) for name in self._collections}
+
+    def delete(self, name):
+        self._collections.pop(name, None)
+
+
+class FakeWeaviateClient:
+    def __init__(self):
+        self.collections = FakeCollections()
+
+    def is_ready(self):
+        return True
+
+    def is_connected(self):
+        return True
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
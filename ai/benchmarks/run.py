@@ -0,0 +1,324 @@
+"""
+Offline benchmark for the FilDOS AI API
+
+Serves synthetic files from a local HTTP stub, swaps Weaviate for an
+in-process stand-in and uses tiny random models unless --real-models is
+given. Results are written as JSON so runs can be compared across commits.
+
+Usage (from the ai/ directory):
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLLECTION_NAME = 'BenchmarkFiles'
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for /embed and /search")
+    parser.add_argument('--files', type=int, default=48, help='number of files to embed')
+    parser.add_argument('--batch-size', type=int, default=16, help='file URLs per /embed request')
+    parser.add_argument('--image-sizes', type=parse_int_list, default=[224, 1024],
+                        help='image side lengths in pixels')
+    parser.add_argument('--doc-sizes', type=parse_int_list, default=[2000, 50000],
+                        help='document sizes in bytes')
+    parser.add_argument('--concurrency', type=parse_int_list, default=[1, 4, 16],
+                        help='/search concurrency levels')
+    parser.add_argument('--search-requests', type=int, default=200,
+                        help='/search requests per concurrency level')
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--real-models', action='store_true',
+                        help='use the configured production models instead of tiny random ones')
+    parser.add_argument('--weaviate-url',
+                        help='use a real Weaviate (e.g. a local container) instead of the in-process stand-in')
+    parser.add_argument('--result-cache', action='store_true',
+                        help='keep the search result cache on (repeated queries become cache hits)')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--cold-start-probe', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def use_fake_weaviate():
+    """Route the app's Weaviate connection to the in-process stand-in"""
+    import weaviate
+    from benchmarks.fake_weaviate import FakeWeaviateClient
+
+    client = FakeWeaviateClient()
+    weaviate.connect_to_local = lambda *args, **kwargs: client
+    weaviate.connect_to_weaviate_cloud = lambda *args, **kwargs: client
+
+
+def prepare_environment(args, work_dir):
+    """Set the environment the app reads at import time"""
+    env = {}
+    if not args.real_models:
+        from benchmarks.synthetic import build_tiny_models
+        clip_dir, text_dir = build_tiny_models(os.path.join(work_dir, 'models'), seed=args.seed)
+        # Same registry layout as config.json, pointed at the tiny models
+        with open(os.path.join(AI_DIR, 'config.json')) as f:
+            config = json.load(f)
+        config['models']['clip']['model_name'] = clip_dir
+        config['models']['sentence_transformer']['model_name'] = text_dir
+        config_path = os.path.join(work_dir, 'config.json')
+        with open(config_path, 'w') as f:
+            json.dump(config, f)
+        env['MODEL_CONFIG'] = config_path
+    if args.weaviate_url:
+        env['WEAVIATE_URL'] = args.weaviate_url
+    # Every concurrency level replays the same queries, so measure uncached search by default
+    env['RESULT_CACHE_ENABLED'] = 'true' if args.result_cache else 'false'
+    env['RESULT_CACHE_PATH'] = os.path.join(work_dir, 'result-cache.sqlite')
+    # Keep per-file log lines out of the report
+    env['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'WARNING')
+    os.environ.update(env)
+    # Single process, so metrics stay in the default registry
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    return env
+
+
+def import_app(args):
+    """Import the Flask app, returning (module, seconds taken)"""
+    if not args.weaviate_url:
+        use_fake_weaviate()
+    start = time.perf_counter()
+    import app
+    return app, time.perf_counter() - start
+
+
+def measure_cold_start(args):
+    """Time a fresh interpreter importing the app and loading the default models"""
+    cmd = [sys.executable, '-m', 'benchmarks.run', '--cold-start-probe']
+    if args.weaviate_url:
+        cmd += ['--weaviate-url', args.weaviate_url]
+    if args.real_models:
+        cmd.append('--real-models')
+    start = time.perf_counter()
+    output = subprocess.run(cmd, cwd=AI_DIR, env=os.environ.copy(), check=True,
+                            capture_output=True, text=True).stdout
+    total = time.perf_counter() - start
+    import_seconds = json.loads(output.strip().splitlines()[-1])['import_seconds']
+    return {'process_seconds': total, 'import_seconds': import_seconds}
+
+
+def start_server(flask_app):
+    """Serve the app on an ephemeral port in a background thread"""
+    from werkzeug.serving import make_server
+
+    # One access log line per request would swamp the report and slow the server down
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def percentiles(samples):
+    values = np.asarray(samples) * 1000.0
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+    }
+
+
+def bench_embed(base_url, stub, names, batch_size):
+    """Embed every file, returning throughput and per-batch latency"""
+    session = requests.Session()
+    # Warm up code paths outside the measured window
+    session.post(f"{base_url}/embed", json={
+        'file_urls': [stub.url(names[0])], 'collection_name': COLLECTION_NAME + 'Warmup'
+    }).raise_for_status()
+
+    batch_latencies = []
+    totals = {'processed': 0, 'skipped': 0, 'failed': 0}
+    start = time.perf_counter()
+    for i in range(0, len(names), batch_size):
+        urls = [stub.url(name) for name in names[i:i + batch_size]]
+        batch_start = time.perf_counter()
+        response = session.post(f"{base_url}/embed", json={
+            'file_urls': urls, 'collection_name': COLLECTION_NAME
+        })
+        batch_latencies.append(time.perf_counter() - batch_start)
+        response.raise_for_status()
+        body = response.json()
+        totals['processed'] += body['total_processed']
+        totals['skipped'] += body['total_skipped']
+        totals['failed'] += body['total_failed']
+    elapsed = time.perf_counter() - start
+    return {
+        'files': len(names),
+        'seconds': elapsed,
+        'files_per_second': len(names) / elapsed if elapsed else 0.0,
+        'batch_latency': percentiles(batch_latencies),
+        **totals,
+    }
+
+
+def bench_search(base_url, queries, concurrency, top_k):
+    """Run all queries at the given concurrency and report latency percentiles"""
+    local = threading.local()
+
+    def one(query):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        response = local.session.post(f"{base_url}/search", json={
+            'query': query, 'collection_name': COLLECTION_NAME, 'top_k': top_k
+        })
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, queries))
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'requests': len(queries),
+        'requests_per_second': len(queries) / elapsed if elapsed else 0.0,
+        **percentiles(latencies),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=AI_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def flatten(results):
+    """Key metrics as {name: value} for comparisons"""
+    flat = {
+        'embed.files_per_second': results['embed']['files_per_second'],
+        'cold_start.process_seconds': results['cold_start']['process_seconds'],
+        'peak_rss_mb': results['peak_rss_mb'],
+    }
+    for entry in results['search']:
+        prefix = f"search.c{entry['concurrency']}"
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_second'):
+            flat[f"{prefix}.{key}"] = entry[key]
+    return flat
+
+
+def print_comparison(baseline, current):
+    """Print key metrics side by side with the relative change"""
+    old = flatten(baseline['results'])
+    new = flatten(current['results'])
+    print(f"\n{'metric':<34}{'baseline':>12}{'current':>12}{'change':>10}")
+    for key, value in new.items():
+        if key not in old:
+            continue
+        change = (value - old[key]) / old[key] * 100 if old[key] else 0.0
+        print(f"{key:<34}{old[key]:>12.2f}{value:>12.2f}{change:>+9.1f}%")
+
+
+def run(args):
+    from benchmarks.synthetic import FileStub, build_corpus, make_queries
+
+    with tempfile.TemporaryDirectory(prefix='fildos-bench-') as work_dir:
+        print("Preparing models and synthetic corpus...")
+        prepare_environment(args, work_dir)
+        corpus = build_corpus(args.files, args.image_sizes, args.doc_sizes, seed=args.seed)
+        queries = make_queries(args.search_requests, seed=args.seed)
+
+        print("Measuring cold start...")
+        cold_start = measure_cold_start(args)
+
+        app_module, _ = import_app(args)
+        server, base_url = start_server(app_module.app)
+        try:
+            with FileStub(corpus) as stub:
+                print(f"Embedding {len(corpus)} files...")
+                embed = bench_embed(base_url, stub, sorted(corpus), args.batch_size)
+                search = []
+                for concurrency in args.concurrency:
+                    print(f"Searching at concurrency {concurrency}...")
+                    search.append(bench_search(base_url, queries, concurrency, args.top_k))
+        finally:
+            server.shutdown()
+
+    import torch
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'device': app_module.device,
+            'models': 'real' if args.real_models else 'tiny',
+            'weaviate': args.weaviate_url or 'in-process',
+            'args': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'cold_start_probe')},
+        },
+        'results': {
+            'embed': embed,
+            'search': search,
+            'cold_start': cold_start,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.cold_start_probe:
+        app_module, seconds = import_app(args)
+        # Models load lazily, so include loading the defaults in cold start
+        start = time.perf_counter()
+        registry = app_module.registry
+        for key in registry.default_models.values():
+            with registry.use(key):
+                pass
+        seconds += time.perf_counter() - start
+        # Log lines are written by a background thread; keep them ahead of the result line
+        import logs
+        logs.flush()
+        print(json.dumps({'import_seconds': seconds}))
+        return
+
+    report = run(args)
+    print(json.dumps(report['results'], indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Synthetic inputs for the benchmark: files of controlled sizes, a local HTTP
+stub that serves them, and tiny randomly initialised models
+"""
+
+import io
+import json
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+WORDS = (
+    "invoice meeting notes budget report design photo holiday contract "
+    "summary draft review project roadmap quarterly revenue customer "
+    "storage network protocol filecoin folder archive backup"
+).split()
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'txt': 'text/plain',
+    'md': 'text/markdown',
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+
+def make_text(rng, size_bytes):
+    """Random prose of roughly size_bytes"""
+    words = []
+    length = 0
+    while length < size_bytes:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def make_image(rng, side, fmt):
+    """Random noise image of side x side pixels"""
+    array = np.random.default_rng(rng.randrange(2 ** 32)).integers(
+        0, 256, size=(side, side, 3), dtype=np.uint8
+    )
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format='JPEG' if fmt == 'jpg' else 'PNG')
+    return buffer.getvalue()
+
+
+def make_pdf(text):
+    """Minimal single-page PDF containing text"""
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    lines = [escaped[i:i + 90] for i in range(0, len(escaped), 90)][:60]
+    stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+        "/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def make_docx(text):
+    """DOCX with one paragraph per 500 characters"""
+    from docx import Document
+    document = Document()
+    for i in range(0, len(text), 500):
+        document.add_paragraph(text[i:i + 500])
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def build_corpus(count, image_sizes, doc_sizes, seed=0):
+    """Build {name: (bytes, content_type)} cycling through sizes and formats"""
+    rng = random.Random(seed)
+    kinds = [('png', s) for s in image_sizes] + [('jpg', s) for s in image_sizes]
+    kinds += [(ext, s) for ext in ('txt', 'md', 'pdf', 'docx') for s in doc_sizes]
+    corpus = {}
+    for i in range(count):
+        ext, size = kinds[i % len(kinds)]
+        if ext in ('png', 'jpg'):
+            data = make_image(rng, size, ext)
+        else:
+            text = make_text(rng, size)
+            if ext == 'pdf':
+                data = make_pdf(text)
+            elif ext == 'docx':
+                data = make_docx(text)
+            else:
+                data = text.encode('utf-8')
+        corpus[f"file_{i:05d}.{ext}"] = (data, CONTENT_TYPES[ext])
+    return corpus
+
+
+def make_queries(count, seed=0):
+    """Short natural-language style queries"""
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(count)]
+
+
+class FileStub:
+    """Local HTTP server that serves an in-memory corpus"""
+
+    def __init__(self, corpus):
+        files = corpus
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                entry = files.get(self.path.lstrip('/'))
+                if entry is None:
+                    self.send_error(404)
+                    return
+                data, content_type = entry
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server.server_port}/{name}"
+
+
+def build_tiny_models(target_dir, seed=0):
+    """Save randomly initialised CLIP and SentenceTransformer models
+
+    Output dimensions match the real models (512 for CLIP, 384 for text) so
+    the dummy vectors in app.py line up. Returns (clip_dir, text_dir).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import (
+        BertConfig,
+        BertModel,
+        BertTokenizerFast,
+        CLIPConfig,
+        CLIPImageProcessor,
+        CLIPModel,
+        CLIPProcessor,
+        CLIPTokenizer,
+    )
+    from transformers.models.clip.tokenization_clip import bytes_to_unicode
+
+    torch.manual_seed(seed)
+    clip_dir = os.path.join(target_dir, 'tiny-clip')
+    text_dir = os.path.join(target_dir, 'tiny-sbert')
+    bert_dir = os.path.join(target_dir, 'tiny-bert')
+
+    # CLIP: byte-level vocabulary with no merges
+    byte_chars = list(bytes_to_unicode().values())
+    vocab = byte_chars + [c + '</w>' for c in byte_chars] + ['<|startoftext|>', '<|endoftext|>']
+    os.makedirs(clip_dir, exist_ok=True)
+    vocab_file = os.path.join(target_dir, 'clip-vocab.json')
+    merges_file = os.path.join(target_dir, 'clip-merges.txt')
+    with open(vocab_file, 'w', encoding='utf-8') as f:
+        json.dump({token: i for i, token in enumerate(vocab)}, f)
+    with open(merges_file, 'w', encoding='utf-8') as f:
+        f.write("#version: 0.2\n")
+    tokenizer = CLIPTokenizer(vocab_file, merges_file)
+    image_processor = CLIPImageProcessor(
+        size={'shortest_edge': 32},
+        crop_size={'height': 32, 'width': 32}
+    )
+    CLIPProcessor(image_processor=image_processor, tokenizer=tokenizer).save_pretrained(clip_dir)
+    config = CLIPConfig(
+        text_config={
+            'vocab_size': len(vocab), 'hidden_size': 32, 'intermediate_size': 64,
+            'num_hidden_layers': 2, 'num_attention_heads': 2, 'max_position_embeddings': 77,
+            'bos_token_id': len(vocab) - 2, 'eos_token_id': len(vocab) - 1,
+        },
+        vision_config={
+            'hidden_size': 32, 'intermediate_size': 64, 'num_hidden_layers': 2,
+            'num_attention_heads': 2, 'image_size': 32, 'patch_size': 8,
+        },
+        projection_dim=512
+    )
+    CLIPModel(config).save_pretrained(clip_dir)
+
+    # SentenceTransformer: one-layer BERT with a character vocabulary and mean pooling
+    os.makedirs(bert_dir, exist_ok=True)
+    bert_vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+    bert_vocab += list("abcdefghijklmnopqrstuvwxyz0123456789.,;:!?'\"()-")
+    bert_vocab += ['##' + c for c in "abcdefghijklmnopqrstuvwxyz0123456789"]
+    bert_vocab += sorted(set(WORDS))
+    with open(os.path.join(bert_dir, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        f.write("\n".join(bert_vocab) + "\n")
+    BertTokenizerFast(os.path.join(bert_dir, 'vocab.txt')).save_pretrained(bert_dir)
+    BertModel(BertConfig(
+        vocab_size=len(bert_vocab), hidden_size=384, intermediate_size=128,
+        num_hidden_layers=1, num_attention_heads=4, max_position_embeddings=256
+    )).save_pretrained(bert_dir)
+    transformer = models.Transformer(bert_dir, max_seq_length=256)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode='mean')
+    SentenceTransformer(modules=[transformer, pooling]).save(text_dir)
+
+    return clip_dir, text_dir
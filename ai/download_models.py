@@ -1,48 +1,51 @@
 import os
-import torch
-from sentence_transformers import SentenceTransformer
-from transformers import CLIPProcessor, CLIPModel
 
-def download_models():
-    """Download and cache all required AI models"""
+from model_registry import load_config
+
+def model_cache_dir(config):
+    """Directory the configured models are cached under"""
+    return os.path.join(os.path.dirname(__file__), config.get('settings', {}).get('cache_base_dir', 'models'))
+
+def download_models(model_keys=None):
+    """Download and cache models from config.json (the default models unless keys are given)"""
+    # Imported here so startup scripts can check the cache without importing the model libraries
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from transformers import CLIPProcessor, CLIPModel
+    
     print("Starting model download process...")
     
+    config = load_config()
+    
     # Create models directory
-    MODEL_CACHE_DIR = os.path.join(os.path.dirname(__file__), "models")
+    MODEL_CACHE_DIR = model_cache_dir(config)
     os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
     
     # Check device
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Using device: {device}")
     
+    # Other configured models are downloaded on first use unless requested here
+    models = config['models']
+    keys = model_keys or list(dict.fromkeys(config.get('collections', {}).get('default_models', {}).values()))
+    
     try:
-        # Download CLIP model and processor
-        print("\n1. Downloading CLIP model (openai/clip-vit-base-patch32)...")
-        clip_cache_dir = os.path.join(MODEL_CACHE_DIR, "clip-vit-base-patch32")
-        
-        clip_model = CLIPModel.from_pretrained(
-            "openai/clip-vit-base-patch32",
-            cache_dir=clip_cache_dir
-        )
-        clip_processor = CLIPProcessor.from_pretrained(
-            "openai/clip-vit-base-patch32",
-            cache_dir=clip_cache_dir
-        )
-        print("✓ CLIP model downloaded successfully")
+        for i, key in enumerate(keys, start=1):
+            spec = models[key]
+            model_name = spec['model_name']
+            revision = spec.get('revision', 'main')
+            cache_dir = os.path.join(MODEL_CACHE_DIR, spec.get('cache_dir', key))
+            print(f"\n{i}. Downloading {key} ({model_name}@{revision})...")
+            
+            if spec.get('type') == 'clip':
+                CLIPModel.from_pretrained(model_name, revision=revision, cache_dir=cache_dir)
+                CLIPProcessor.from_pretrained(model_name, revision=revision, cache_dir=cache_dir)
+            else:
+                SentenceTransformer(model_name, revision=revision, cache_folder=cache_dir)
+            print(f"✓ {key} downloaded successfully")
         
-        # Download SentenceTransformer model
-        print("\n2. Downloading SentenceTransformer model (all-MiniLM-L6-v2)...")
-        sbert_cache_dir = os.path.join(MODEL_CACHE_DIR, "all-MiniLM-L6-v2")
-        
-        text_model = SentenceTransformer(
-            "all-MiniLM-L6-v2",
-            cache_folder=sbert_cache_dir
-        )
-        print("SentenceTransformer model downloaded successfully")
         print(f"\nAll models downloaded and cached successfully!")
         print(f"Models cached in: {MODEL_CACHE_DIR}")
-        print(f"CLIP cache: {clip_cache_dir}")
-        print(f"SentenceTransformer cache: {sbert_cache_dir}")
         
         # Show cache size
         total_size = get_directory_size(MODEL_CACHE_DIR)
@@ -77,15 +80,15 @@ def format_size(size_bytes):
     return f"{s} {size_names[i]}"
 
 def check_models_exist():
-    """Check if models are already downloaded"""
-    MODEL_CACHE_DIR = os.path.join(os.path.dirname(__file__), "models")
-    clip_cache_dir = os.path.join(MODEL_CACHE_DIR, "clip-vit-base-patch32")
-    sbert_cache_dir = os.path.join(MODEL_CACHE_DIR, "all-MiniLM-L6-v2")
-    
-    clip_exists = os.path.exists(clip_cache_dir) and os.listdir(clip_cache_dir)
-    sbert_exists = os.path.exists(sbert_cache_dir) and os.listdir(sbert_cache_dir)
+    """Check if the default models are already downloaded"""
+    config = load_config()
+    MODEL_CACHE_DIR = model_cache_dir(config)
     
-    return clip_exists and sbert_exists
+    for key in config.get('collections', {}).get('default_models', {}).values():
+        cache_dir = os.path.join(MODEL_CACHE_DIR, config['models'][key].get('cache_dir', key))
+        if not (os.path.exists(cache_dir) and os.listdir(cache_dir)):
+            return False
+    return True
 
 def main():
     """Main function"""
@@ -94,7 +97,7 @@ def main():
     print("=" * 50)
     
     if check_models_exist():
-        MODEL_CACHE_DIR = os.path.join(os.path.dirname(__file__), "models")
+        MODEL_CACHE_DIR = model_cache_dir(load_config())
         total_size = get_directory_size(MODEL_CACHE_DIR)
         print(f"Models already exist in cache ({format_size(total_size)})")
         print(f"Cache location: {MODEL_CACHE_DIR}")
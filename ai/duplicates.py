@@ -0,0 +1,182 @@
+"""
+Near-duplicate detection over a collection's stored vectors
+
+Vectors are streamed from Weaviate page by page with cursor pagination into
+compact float32 arrays (one per file type), L2-normalised, and compared with
+blocked all-pairs matrix products so each step only holds one
+block_size x block_size similarity tile. Pairs at or above the threshold are
+grouped into clusters with connected components. At most DUPLICATES_MAX_PAIRS
+pairs are collected per file type, so a low threshold fails fast instead of
+growing towards n^2 / 2 pairs.
+"""
+
+import os
+import time
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+import lanes
+import metrics
+
+# Named vector compared for each file type
+VECTOR_FOR_TYPE = {
+    'image': 'image_vector',
+    'text': 'text_vector',
+}
+
+PAGE_SIZE = 1000
+BLOCK_SIZE = 1024
+MAX_PAIRS = int(os.environ.get('DUPLICATES_MAX_PAIRS', 1000000))
+
+
+class TooManyPairs(Exception):
+    """More pairs matched than max_pairs; the threshold is too low"""
+
+
+def load_vectors(collection, file_types, page_size=PAGE_SIZE):
+    """Stream vectors out of a collection
+
+    Returns {file_type: (matrix, files)} where matrix rows are L2-normalised and
+    files holds (id, url, filename) per row. Zero placeholder vectors are skipped.
+    """
+    pages = {file_type: [] for file_type in file_types}
+    files = {file_type: [] for file_type in file_types}
+    after = None
+    while True:
+        with metrics.time_stage('vector_scan'):
+            response = collection.query.fetch_objects(
+                limit=page_size,
+                after=after,
+                include_vector=[VECTOR_FOR_TYPE[t] for t in file_types],
+                return_properties=['filename', 'url', 'type']
+            )
+        objects = response.objects
+        if not objects:
+            break
+        rows = {file_type: [] for file_type in file_types}
+        for obj in objects:
+            file_type = obj.properties.get('type')
+            if file_type not in rows:
+                continue
+            vector = obj.vector.get(VECTOR_FOR_TYPE[file_type])
+            if not vector or not any(vector):
+                continue
+            rows[file_type].append(vector)
+            files[file_type].append((str(obj.uuid), obj.properties.get('url'), obj.properties.get('filename')))
+        for file_type, vectors in rows.items():
+            if vectors:
+                # Convert each page right away so Python lists never hold the whole collection
+                pages[file_type].append(np.asarray(vectors, dtype=np.float32))
+        after = objects[-1].uuid
+        if len(objects) < page_size:
+            break
+
+    result = {}
+    for file_type, arrays in pages.items():
+        if not arrays:
+            continue
+        matrix = np.concatenate(arrays)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        result[file_type] = (matrix, files[file_type])
+    return result
+
+
+def similar_pairs(matrix, threshold, block_size=BLOCK_SIZE, max_pairs=MAX_PAIRS):
+    """Return (rows, cols, scores) for all pairs i < j with cosine similarity >= threshold
+
+    Raises TooManyPairs once more than max_pairs pairs match.
+    """
+    n = matrix.shape[0]
+    rows, cols, scores = [], [], []
+    found = 0
+    for i in range(0, n, block_size):
+        # Bulk work: let interactive searches run between row blocks
+        lanes.yield_to_interactive('batch')
+        left = matrix[i:i + block_size]
+        with metrics.time_stage('pairwise'):
+            for j in range(i, n, block_size):
+                tile = left @ matrix[j:j + block_size].T
+                if i == j:
+                    # Only the upper triangle, excluding each file with itself
+                    tile = np.triu(tile, k=1)
+                r, c = np.nonzero(tile >= threshold)
+                found += r.size
+                if found > max_pairs:
+                    raise TooManyPairs(f"More than {max_pairs} pairs at threshold {threshold}; raise the threshold")
+                if r.size:
+                    rows.append(r + i)
+                    cols.append(c + j)
+                    scores.append(tile[r, c])
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+
+
+def cluster_pairs(n, rows, cols, scores, files, file_type):
+    """Group duplicate pairs into clusters with per-file and per-cluster scores"""
+    if rows.size == 0:
+        return []
+    graph = coo_matrix((np.ones(rows.size, dtype=np.int8), (rows, cols)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    # Best match score for each file
+    best = np.zeros(n, dtype=np.float32)
+    np.maximum.at(best, rows, scores)
+    np.maximum.at(best, cols, scores)
+
+    # Sort edges by cluster so each cluster is one contiguous slice
+    edge_labels = labels[rows]
+    order = np.argsort(edge_labels, kind='stable')
+    rows, cols, scores, edge_labels = rows[order], cols[order], scores[order], edge_labels[order]
+    _, starts = np.unique(edge_labels, return_index=True)
+    ends = np.append(starts[1:], edge_labels.size)
+
+    clusters = []
+    for begin, end in zip(starts, ends):
+        members = np.unique(np.concatenate([rows[begin:end], cols[begin:end]]))
+        cluster_scores = scores[begin:end]
+        clusters.append({
+            'type': file_type,
+            'size': int(members.size),
+            'max_score': float(cluster_scores.max()),
+            'min_score': float(cluster_scores.min()),
+            'files': [
+                {
+                    'id': files[m][0],
+                    'url': files[m][1],
+                    'filename': files[m][2],
+                    'score': float(best[m])
+                }
+                for m in sorted(members, key=lambda m: -best[m])
+            ]
+        })
+    return clusters
+
+
+def find_duplicates(collection, threshold=0.95, file_types=('image', 'text'),
+                    max_clusters=100, page_size=PAGE_SIZE, block_size=BLOCK_SIZE, max_pairs=MAX_PAIRS):
+    """Find clusters of near-identical files in a collection"""
+    start = time.perf_counter()
+    vectors = load_vectors(collection, file_types, page_size)
+
+    clusters = []
+    scanned = 0
+    for file_type, (matrix, files) in vectors.items():
+        scanned += len(files)
+        rows, cols, scores = similar_pairs(matrix, threshold, block_size, max_pairs)
+        clusters.extend(cluster_pairs(len(files), rows, cols, scores, files, file_type))
+
+    clusters.sort(key=lambda c: (c['size'], c['max_score']), reverse=True)
+    return {
+        'threshold': threshold,
+        'scanned': scanned,
+        'total_clusters': len(clusters),
+        'total_duplicates': sum(c['size'] - 1 for c in clusters),
+        'clusters': clusters[:max_clusters],
+        'elapsed_seconds': time.perf_counter() - start
+    }
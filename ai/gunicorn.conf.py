@@ -1,7 +1,32 @@
 # Gunicorn configuration file for FilDOS AI API
 
+import glob
 import multiprocessing
 import os
+import tempfile
+
+# Prometheus multiprocess mode: must be set before the app (and prometheus_client) is imported
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'fildos-prometheus')
+)
+
+# Clear metric files and cached results left over from a previous run. This runs
+# when the config is loaded, before preload_app imports the app and metrics.py
+# starts writing to the directory. Only prometheus_client's *.db files are
+# removed, in case the variable points at a directory holding anything else.
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+for _path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+    os.remove(_path)
+
+# Result cache entries shared by the workers of the previous run
+_cache_path = os.environ.get(
+    'RESULT_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'fildos-result-cache.sqlite')
+)
+for _suffix in ('', '-wal', '-shm'):
+    if _cache_path and os.path.exists(_cache_path + _suffix):
+        os.remove(_cache_path + _suffix)
 
 # Server socket
 bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
@@ -9,7 +34,17 @@ backlog = 2048
 
 # Worker processes
 workers = 1  # Important: Only 1 worker for AI models to avoid memory issues
-worker_class = "sync"
+# Threads let /search run alongside a long /embed; see lanes.py
+worker_class = "gthread"
+# By default one thread per lane slot and per queued bulk request, plus a few
+# for unlaned endpoints (/health, /metrics), so running and queued bulk jobs
+# can never take the threads reserved for the search lane
+_lane_slots = sum(
+    int(os.environ.get(name, default))
+    for name, default in (('SEARCH_LANE_SIZE', 8), ('EMBED_LANE_SIZE', 1), ('BATCH_LANE_SIZE', 1))
+)
+_bulk_queues = 2 * int(os.environ.get('BULK_QUEUE_SIZE', 4))
+threads = int(os.environ.get('THREADS', _lane_slots + _bulk_queues + 2))
 worker_connections = 1000
 timeout = 600
 keepalive = 2
@@ -39,3 +74,9 @@ tmp_upload_dir = None
 
 # Worker timeouts
 graceful_timeout = 30
+
+# Server hooks
+def child_exit(server, worker):
+    """Drop live gauges of a worker that has exited"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,191 @@
+"""
+Execution lanes for FilDOS AI API
+
+Interactive search, bulk embedding and collection-wide batch jobs run in
+separate lanes so a long /embed call cannot hold up /search:
+
+- Admission: each lane admits a bounded number of concurrent requests
+  (SEARCH_LANE_SIZE, EMBED_LANE_SIZE, BATCH_LANE_SIZE); callers that wait longer
+  than LANE_TIMEOUT seconds get a 503. At most BULK_QUEUE_SIZE requests queue
+  for each bulk lane (embed, batch); more get a 503 right away. gunicorn.conf.py
+  sizes the thread pool to cover every lane slot plus the bulk queues, so
+  queued bulk requests never take the threads /search needs.
+- Inference: model forward passes share INFERENCE_SLOTS slots. When slots are
+  contended, waiters from the lane listed first in LANE_PRIORITIES always go
+  first, so a search waits for at most the forward pass already running.
+- Throttling: between files, a lower-priority lane pauses for up to
+  BULK_YIELD_MS while higher-priority requests are in flight.
+
+Requires a threaded worker (gunicorn.conf.py uses gthread).
+"""
+
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import jsonify
+
+import metrics
+
+LANE_SIZES = {
+    'search': int(os.environ.get('SEARCH_LANE_SIZE', 8)),
+    'embed': int(os.environ.get('EMBED_LANE_SIZE', 1)),
+    'batch': int(os.environ.get('BATCH_LANE_SIZE', 1)),
+}
+INFERENCE_SLOTS = int(os.environ.get('INFERENCE_SLOTS', 1))
+LANE_PRIORITIES = [
+    lane.strip() for lane in os.environ.get('LANE_PRIORITIES', 'search,embed,batch').split(',') if lane.strip()
+]
+LANE_TIMEOUT = float(os.environ.get('LANE_TIMEOUT', 60))
+BULK_QUEUE_SIZE = int(os.environ.get('BULK_QUEUE_SIZE', 4))
+# Most requests waiting per lane; searches are bounded by the thread pool instead
+LANE_QUEUES = {'embed': BULK_QUEUE_SIZE, 'batch': BULK_QUEUE_SIZE}
+BULK_YIELD_MS = float(os.environ.get('BULK_YIELD_MS', 50))
+
+
+class LaneBusy(Exception):
+    """No slot in the lane freed up within LANE_TIMEOUT, or its queue is full"""
+
+
+def _priority(lane):
+    """Lower is more urgent; lanes not listed come last"""
+    try:
+        return LANE_PRIORITIES.index(lane)
+    except ValueError:
+        return len(LANE_PRIORITIES)
+
+
+class AdmissionGate:
+    """Bounded number of concurrent requests per lane"""
+
+    def __init__(self, sizes):
+        self._cond = threading.Condition()
+        self._sizes = dict(sizes)
+        self._active = {lane: 0 for lane in sizes}
+        self._queued = {lane: 0 for lane in sizes}
+        self.publish_capacity()
+        # Gauge values live per process; workers forked after preload start at zero
+        os.register_at_fork(after_in_child=self.publish_capacity)
+
+    def publish_capacity(self):
+        for lane, size in self._sizes.items():
+            metrics.LANE_CAPACITY.labels(lane, 'admission').set(size)
+
+    @contextmanager
+    def slot(self, lane, timeout):
+        waiting = metrics.LANE_WAITING.labels(lane, 'admission')
+        start = time.perf_counter()
+        with self._cond:
+            free = self._active[lane] < self._sizes[lane]
+            if not free and self._queued[lane] >= LANE_QUEUES.get(lane, float('inf')):
+                raise LaneBusy(lane)
+            self._queued[lane] += 1
+            waiting.inc()
+            try:
+                admitted = self._cond.wait_for(lambda: self._active[lane] < self._sizes[lane], timeout)
+            finally:
+                self._queued[lane] -= 1
+                waiting.dec()
+            if not admitted:
+                raise LaneBusy(lane)
+            self._active[lane] += 1
+        metrics.observe_lane_wait(lane, 'admission', time.perf_counter() - start)
+        in_flight = metrics.LANE_IN_FLIGHT.labels(lane, 'admission')
+        in_flight.inc()
+        try:
+            yield
+        finally:
+            in_flight.dec()
+            with self._cond:
+                self._active[lane] -= 1
+                self._cond.notify_all()
+
+    def wait_for_higher(self, lane, timeout):
+        """Block until no higher-priority lane has requests in flight, or timeout"""
+        rank = _priority(lane)
+        with self._cond:
+            self._cond.wait_for(
+                lambda: not any(count for other, count in self._active.items()
+                                if _priority(other) < rank),
+                timeout
+            )
+
+
+class PriorityGate:
+    """Counting gate where waiters from higher-priority lanes are always served first"""
+
+    def __init__(self, slots, lanes):
+        self._cond = threading.Condition()
+        self._free = slots
+        self._slots = slots
+        self._waiting = {lane: 0 for lane in lanes}
+        self.publish_capacity()
+        os.register_at_fork(after_in_child=self.publish_capacity)
+
+    def publish_capacity(self):
+        for lane in self._waiting:
+            metrics.LANE_CAPACITY.labels(lane, 'inference').set(self._slots)
+
+    def _blocked(self, lane):
+        if self._free <= 0:
+            return True
+        rank = _priority(lane)
+        return any(count for other, count in self._waiting.items() if _priority(other) < rank)
+
+    @contextmanager
+    def slot(self, lane):
+        waiting = metrics.LANE_WAITING.labels(lane, 'inference')
+        start = time.perf_counter()
+        with self._cond:
+            self._waiting[lane] = self._waiting.get(lane, 0) + 1
+            waiting.inc()
+            try:
+                self._cond.wait_for(lambda: not self._blocked(lane))
+            finally:
+                self._waiting[lane] -= 1
+                waiting.dec()
+            self._free -= 1
+        metrics.observe_lane_wait(lane, 'inference', time.perf_counter() - start)
+        in_flight = metrics.LANE_IN_FLIGHT.labels(lane, 'inference')
+        in_flight.inc()
+        try:
+            yield
+        finally:
+            in_flight.dec()
+            with self._cond:
+                self._free += 1
+                self._cond.notify_all()
+
+
+admission = AdmissionGate(LANE_SIZES)
+inference = PriorityGate(INFERENCE_SLOTS, LANE_SIZES)
+
+
+def inference_slot(lane):
+    """Context manager guarding a model forward pass"""
+    return inference.slot(lane)
+
+
+def yield_to_interactive(lane):
+    """Pause a bulk lane briefly while higher-priority requests are running"""
+    if BULK_YIELD_MS > 0:
+        admission.wait_for_higher(lane, BULK_YIELD_MS / 1000.0)
+
+
+def lane(name):
+    """Decorator running a view inside the named lane"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with admission.slot(name, LANE_TIMEOUT):
+                    return view(*args, **kwargs)
+            except LaneBusy:
+                metrics.LANE_REJECTED.labels(name).inc()
+                response = jsonify({'error': f'Server busy: {name} lane is full, retry later'})
+                response.headers['Retry-After'] = '1'
+                return response, 503
+        return wrapper
+    return decorator
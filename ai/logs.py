@@ -0,0 +1,187 @@
+"""
+Structured logging for FilDOS AI API
+
+Log records are written as one JSON object per line:
+
+    {"ts": "...", "level": "INFO", "stage": "embed", "msg": "...",
+     "request_id": "...", "url": "...", ...}
+
+- Stages: each part of the service logs under its own stage
+  (get_logger('download') -> logger "fildos.download"). LOG_LEVEL sets the
+  default level and LOG_LEVELS overrides it per stage, e.g.
+  LOG_LEVELS="download=WARNING,embed=DEBUG".
+- Request ids: every request gets an id (from the X-Request-ID header, or a
+  new one) that is attached to all records logged while it runs and returned
+  in the X-Request-ID response header.
+- Sampling: per-file messages (logged with extra=per_file(...)) are only kept for
+  a LOG_SAMPLE_RATE fraction of requests. Warnings and errors are never
+  sampled out.
+- Non-blocking: loggers only put records on a bounded queue
+  (LOG_QUEUE_SIZE); a background thread formats and writes them. When the
+  queue is full, records are dropped and counted rather than blocking a
+  request thread.
+
+LOG_FORMAT=text writes plain lines instead of JSON, for local development.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+ROOT = 'fildos'
+
+request_id = ContextVar('request_id', default=None)
+request_sampled = ContextVar('request_sampled', default=True)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def get_logger(stage):
+    """Logger for one stage of the service"""
+    return logging.getLogger(f"{ROOT}.{stage}")
+
+
+def per_file(**fields):
+    """extra= for a message logged once per file, subject to request sampling"""
+    return {'per_file': True, **fields}
+
+
+def start_request(incoming_id=None):
+    """Assign a request id and make the per-file sampling decision for this request"""
+    rid = (incoming_id or '')[:64] or uuid.uuid4().hex
+    request_id.set(rid)
+    request_sampled.set(random.random() < LOG_SAMPLE_RATE)
+    return rid
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'stage': record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + '.') else record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != 'per_file' and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(name)s] %(message)s')
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of waiting when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge args and render the traceback here; the record crosses threads
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def filter(self, record):
+        if getattr(record, 'per_file', False) and record.levelno < logging.WARNING and not request_sampled.get():
+            return False
+        return super().filter(record)
+
+
+def _output_handler():
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+    return handler
+
+
+class _Pipeline:
+    """Queue, handler and writer thread; rebuilt in the child after fork"""
+
+    def __init__(self):
+        self.handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        self.output = _output_handler()
+        self.listener = None
+        self.start()
+
+    def start(self):
+        self.listener = logging.handlers.QueueListener(self.handler.queue, self.output)
+        self.listener.start()
+
+    def after_fork(self):
+        # The writer thread does not survive fork; start a fresh one on a fresh queue
+        self.handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        self.handler.dropped = 0
+        self.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(','):
+        if '=' in item:
+            stage, level = item.split('=', 1)
+            levels[stage.strip()] = level.strip().upper()
+    return levels
+
+
+def _configure():
+    pipeline = _Pipeline()
+    root = logging.getLogger(ROOT)
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(pipeline.handler)
+    root.propagate = False
+    for stage, level in _parse_levels(LOG_LEVELS).items():
+        get_logger(stage).setLevel(level)
+    os.register_at_fork(after_in_child=pipeline.after_fork)
+    atexit.register(pipeline.stop)
+    return pipeline
+
+
+pipeline = _configure()
+
+
+def flush():
+    """Wait until every queued record has been written"""
+    pipeline.handler.queue.join()
+
+
+def dropped():
+    """Records dropped because the queue was full"""
+    return pipeline.handler.dropped
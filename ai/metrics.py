@@ -0,0 +1,167 @@
+"""
+Prometheus metrics for FilDOS AI API
+
+When PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py does this), every worker
+writes its samples to mmap files in that directory and /metrics aggregates them,
+so the numbers are correct no matter which worker serves the scrape.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Pipeline stages timed by the hot path
+STAGES = (
+    'download',
+    'type_check',
+    'decode',
+    'extract',
+    'clip_forward',
+    'sbert_forward',
+    'weaviate_query',
+    'weaviate_insert',
+    'vector_scan',
+    'pairwise',
+)
+
+# Downloads can take up to the 30s request timeout, so extend the default buckets
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LATENCY = Histogram(
+    'fildos_stage_duration_seconds',
+    'Time spent in each pipeline stage',
+    ['stage'],
+    buckets=STAGE_BUCKETS
+)
+
+FILES_TOTAL = Counter(
+    'fildos_files_total',
+    'Files handled by /embed, by outcome and reason',
+    ['outcome', 'reason']
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    'fildos_requests_in_flight',
+    'Requests currently being served',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+
+MODEL_MEMORY = Gauge(
+    'fildos_model_memory_bytes',
+    'Memory held by model parameters and buffers',
+    ['model'],
+    multiprocess_mode='livemax'
+)
+
+# Hit ratio is hits / (hits + misses), computed in PromQL
+CACHE_LOOKUPS = Counter(
+    'fildos_cache_lookups_total',
+    'Cache lookups by cache and result',
+    ['cache', 'result']
+)
+
+WEAVIATE_CIRCUIT_OPEN = Gauge(
+    'fildos_weaviate_circuit_open',
+    'Whether a worker is failing Weaviate requests fast (1) or passing them through (0)',
+    multiprocess_mode='livemax'
+)
+
+LANE_WAIT = Histogram(
+    'fildos_lane_wait_seconds',
+    'Time spent waiting for a lane slot, by lane and gate',
+    ['lane', 'gate'],
+    buckets=STAGE_BUCKETS
+)
+
+LANE_IN_FLIGHT = Gauge(
+    'fildos_lane_in_flight',
+    'Slots currently held, by lane and gate',
+    ['lane', 'gate'],
+    multiprocess_mode='livesum'
+)
+
+LANE_WAITING = Gauge(
+    'fildos_lane_waiting',
+    'Callers queued for a slot, by lane and gate',
+    ['lane', 'gate'],
+    multiprocess_mode='livesum'
+)
+
+LANE_CAPACITY = Gauge(
+    'fildos_lane_capacity',
+    'Configured slots per lane and gate',
+    ['lane', 'gate'],
+    multiprocess_mode='livemax'
+)
+
+LANE_REJECTED = Counter(
+    'fildos_lane_rejected_total',
+    'Requests rejected because no lane slot freed up in time',
+    ['lane']
+)
+
+# Resolve label children once so the hot path skips the labels() lookup
+_stage_children = {stage: STAGE_LATENCY.labels(stage) for stage in STAGES}
+
+# Per-request list of (stage, seconds); only set while a request is being profiled
+stage_timings = ContextVar('stage_timings', default=None)
+
+
+@contextmanager
+def time_stage(stage):
+    """Record the duration of the wrapped block under the given stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _stage_children[stage].observe(elapsed)
+        timings = stage_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def observe_lane_wait(lane, gate, seconds):
+    """Record time spent queued for a lane slot"""
+    LANE_WAIT.labels(lane, gate).observe(seconds)
+    timings = stage_timings.get()
+    if timings is not None:
+        timings.append((f"{gate}_wait", seconds))
+
+
+def record_file(outcome, reason):
+    """Count a file handled by /embed"""
+    FILES_TOTAL.labels(outcome, reason).inc()
+
+
+def record_cache_lookup(cache, hit):
+    """Count a cache hit or miss"""
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def track_in_flight(endpoint):
+    """Decorator that counts concurrent requests for an endpoint"""
+    return REQUESTS_IN_FLIGHT.labels(endpoint).track_inprogress()
+
+
+def render_latest():
+    """Render all metrics in Prometheus text format"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
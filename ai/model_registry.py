@@ -0,0 +1,367 @@
+"""
+Config-driven model registry for FilDOS AI API
+
+Models are declared in config.json (or the file named by MODEL_CONFIG) and
+loaded lazily on first use. When the loaded models exceed memory_budget_mb,
+the least recently used idle models are evicted; models idle for longer than
+idle_eviction_seconds are evicted as well.
+
+Each Weaviate collection records which models built its vectors (its
+manifest), and queries are always embedded with those same models. A revision
+that names a branch or tag is recorded as the commit it resolved to, so a
+model that changed upstream is refused rather than silently used.
+"""
+
+import gc
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import logs
+import metrics
+
+log = logs.get_logger('models')
+
+AI_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.environ.get('MODEL_CONFIG', os.path.join(AI_DIR, 'config.json'))
+
+MANIFEST_VERSION = 1
+
+# A revision that already names a single commit on the Hugging Face Hub
+COMMIT_HASH = re.compile(r'[0-9a-f]{40}')
+
+
+class ModelError(Exception):
+    """A model is unknown or does not match what a collection was built with"""
+
+
+class ModelUnavailable(ModelError):
+    """A model failed to load and is not retried until its backoff expires"""
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def load_config(path=CONFIG_PATH):
+    """Read the model configuration file"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def resolve_device(setting):
+    """Map the device setting ("auto", "cpu", "cuda", ...) to a torch device string"""
+    if setting and setting != 'auto':
+        return setting
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def module_memory(module):
+    """Bytes held by a torch module's parameters and buffers"""
+    total = sum(p.numel() * p.element_size() for p in module.parameters())
+    total += sum(b.numel() * b.element_size() for b in module.buffers())
+    return total
+
+
+def commit_hash(model):
+    """Hub commit a transformers model was loaded from, None for local paths"""
+    return getattr(getattr(model, 'config', None), '_commit_hash', None)
+
+
+class ClipEncoder:
+    """CLIP image and text encoder producing L2-normalised vectors"""
+
+    modalities = ('image', 'text')
+
+    def __init__(self, spec, cache_dir, device):
+        from transformers import CLIPModel, CLIPProcessor
+
+        self.device = device
+        self.model = CLIPModel.from_pretrained(
+            spec['model_name'],
+            revision=spec.get('revision', 'main'),
+            cache_dir=cache_dir
+        ).to(device)
+        self.processor = CLIPProcessor.from_pretrained(
+            spec['model_name'],
+            revision=spec.get('revision', 'main'),
+            cache_dir=cache_dir,
+            use_fast=True
+        )
+        self.memory_bytes = module_memory(self.model)
+        self.commit_hash = commit_hash(self.model)
+
+    def encode_image(self, image):
+        import torch
+        inputs = self.processor(images=image, return_tensors="pt").to(self.device)
+        with torch.no_grad():
+            emb = self.model.get_image_features(**inputs)
+        return emb / emb.norm(p=2)
+
+    def encode_text(self, text):
+        import torch
+        # CLIP only sees the first max_position_embeddings tokens
+        inputs = self.processor(
+            text=text,
+            return_tensors="pt",
+            truncation=True,
+            max_length=self.model.config.text_config.max_position_embeddings
+        ).to(self.device)
+        with torch.no_grad():
+            emb = self.model.get_text_features(**inputs)
+        return emb / emb.norm(p=2)
+
+
+class SentenceTransformerEncoder:
+    """SentenceTransformer text encoder"""
+
+    modalities = ('text',)
+
+    def __init__(self, spec, cache_dir, device):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(
+            spec['model_name'],
+            revision=spec.get('revision'),
+            cache_folder=cache_dir
+        ).to(device)
+        self.memory_bytes = module_memory(self.model)
+        self.commit_hash = commit_hash(getattr(self.model._first_module(), 'auto_model', None))
+
+    def encode_text(self, text):
+        return self.model.encode(text, convert_to_tensor=True)
+
+
+ENCODERS = {
+    'clip': ClipEncoder,
+    'sentence_transformer': SentenceTransformerEncoder,
+}
+
+
+class _Entry:
+    def __init__(self):
+        self.encoder = None
+        self.in_use = 0
+        self.last_used = 0.0
+        self.load_lock = threading.Lock()
+        # A failed load is remembered until failed_until so requests fail fast
+        self.failed_until = 0.0
+        self.failure = None
+        # Commit the configured revision resolved to when the model was loaded
+        self.commit_hash = None
+
+
+class ModelRegistry:
+    def __init__(self, config):
+        settings = config.get('settings', {})
+        self.specs = config['models']
+        collections = config.get('collections', {})
+        self.default_models = collections.get('default_models', {'image': 'clip', 'text': 'sentence_transformer'})
+        self.legacy_models = collections.get('legacy_models', self.default_models)
+        self.device = resolve_device(settings.get('device', 'auto'))
+        self.cache_base_dir = os.path.join(AI_DIR, settings.get('cache_base_dir', 'models'))
+        self.max_retries = int(settings.get('max_retries', 3))
+        self.load_failure_backoff = float(settings.get('load_failure_backoff_seconds', 60))
+        self.memory_budget = int(settings.get('memory_budget_mb', 0)) * 1024 * 1024
+        self.idle_eviction_seconds = float(settings.get('idle_eviction_seconds', 0))
+        self.manifest_cache_seconds = float(settings.get('manifest_cache_seconds', 60))
+        os.environ.setdefault('HF_HUB_DOWNLOAD_TIMEOUT', str(settings.get('download_timeout', 300)))
+        os.makedirs(self.cache_base_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = {key: _Entry() for key in self.specs}
+
+    def spec(self, key):
+        if key not in self.specs:
+            raise ModelError(f"Unknown model '{key}'")
+        return self.specs[key]
+
+    def cache_dir(self, key):
+        return os.path.join(self.cache_base_dir, self.spec(key).get('cache_dir', key))
+
+    def loaded(self):
+        """Keys of the models currently in memory"""
+        return [key for key, entry in self._entries.items() if entry.encoder is not None]
+
+    def _load(self, key):
+        spec = self.spec(key)
+        encoder_class = ENCODERS.get(spec.get('type'))
+        if encoder_class is None:
+            raise ModelError(f"Model '{key}' has unsupported type '{spec.get('type')}'")
+        log.info("Loading model", extra={'model': key, 'model_name': spec['model_name']})
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                encoder = encoder_class(spec, self.cache_dir(key), self.device)
+                break
+            except Exception as e:
+                log.warning("Error loading model", extra={
+                    'model': key, 'attempt': attempt, 'max_retries': self.max_retries, 'error': str(e)
+                })
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(2 ** attempt)
+        metrics.MODEL_MEMORY.labels(key).set(encoder.memory_bytes)
+        log.info("Model loaded", extra={'model': key, 'memory_bytes': encoder.memory_bytes})
+        return encoder
+
+    def _check_failed(self, key, entry):
+        """Raise ModelUnavailable while a failed load is backing off"""
+        remaining = entry.failed_until - time.monotonic()
+        if remaining > 0:
+            raise ModelUnavailable(
+                f"Model '{key}' failed to load, retrying in {remaining:.0f}s: {entry.failure}", remaining
+            )
+
+    def _evict(self, key, entry):
+        log.info("Evicting idle model", extra={'model': key})
+        entry.encoder = None
+        metrics.MODEL_MEMORY.labels(key).set(0)
+
+    def _enforce_limits(self, keep):
+        """Evict idle models past the idle timeout or over the memory budget; caller holds _lock"""
+        now = time.monotonic()
+        evicted = False
+        idle = sorted(
+            ((entry.last_used, key, entry) for key, entry in self._entries.items()
+             if entry.encoder is not None and entry.in_use == 0 and key != keep),
+            key=lambda item: item[0]
+        )
+        if self.idle_eviction_seconds:
+            for last_used, key, entry in idle:
+                if now - last_used > self.idle_eviction_seconds:
+                    self._evict(key, entry)
+                    evicted = True
+        if self.memory_budget:
+            total = sum(e.encoder.memory_bytes for e in self._entries.values() if e.encoder is not None)
+            for _, key, entry in idle:
+                if total <= self.memory_budget:
+                    break
+                if entry.encoder is not None:
+                    total -= entry.encoder.memory_bytes
+                    self._evict(key, entry)
+                    evicted = True
+        if evicted:
+            gc.collect()
+            if self.device.startswith('cuda'):
+                import torch
+                torch.cuda.empty_cache()
+
+    @contextmanager
+    def use(self, key):
+        """Yield the loaded encoder for a model, loading it on first use"""
+        self.spec(key)
+        entry = self._entries[key]
+        with self._lock:
+            entry.in_use += 1
+            encoder = entry.encoder
+        metrics.record_cache_lookup('model', encoder is not None)
+        try:
+            if encoder is None:
+                self._check_failed(key, entry)
+                with entry.load_lock:
+                    if entry.encoder is None:
+                        # The load we waited for may have failed
+                        self._check_failed(key, entry)
+                        try:
+                            loaded = self._load(key)
+                        except ModelError:
+                            raise
+                        except Exception as e:
+                            entry.failure = str(e)
+                            entry.failed_until = time.monotonic() + self.load_failure_backoff
+                            raise ModelUnavailable(
+                                f"Model '{key}' failed to load: {e}", self.load_failure_backoff
+                            ) from e
+                        entry.failed_until = 0.0
+                        entry.failure = None
+                        entry.commit_hash = getattr(loaded, 'commit_hash', None)
+                        with self._lock:
+                            entry.encoder = loaded
+                    encoder = entry.encoder
+            yield encoder
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                self._enforce_limits(keep=key)
+
+    def resolved_revision(self, key):
+        """Commit a model's configured revision resolves to, loading the model if needed"""
+        revision = self.spec(key).get('revision', 'main')
+        if COMMIT_HASH.fullmatch(revision):
+            return revision
+        with self.use(key):
+            # Models loaded from a local path have no commit
+            return self._entries[key].commit_hash or revision
+
+    def manifest_entry(self, key, pin=True):
+        """Description of a model as recorded in a collection manifest
+
+        With pin, a branch or tag revision such as main is recorded as the
+        commit it resolved to, so a later upstream change is detected.
+        """
+        spec = self.spec(key)
+        return {
+            'key': key,
+            'model_name': spec['model_name'],
+            'revision': self.resolved_revision(key) if pin else spec.get('revision', 'main'),
+            'dimension': spec['dimension'],
+        }
+
+    def build_manifest(self, image_model=None, text_model=None, pin=True):
+        """Manifest for a new collection, falling back to the default models"""
+        image_key = image_model or self.default_models['image']
+        text_key = text_model or self.default_models['text']
+        for key, modality in ((image_key, 'image'), (text_key, 'text')):
+            encoder_class = ENCODERS.get(self.spec(key).get('type'))
+            if encoder_class is None or modality not in encoder_class.modalities:
+                raise ModelError(f"Model '{key}' cannot embed {modality}")
+        return {
+            'manifest_version': MANIFEST_VERSION,
+            'image': self.manifest_entry(image_key, pin),
+            'text': self.manifest_entry(text_key, pin),
+        }
+
+    def legacy_manifest(self):
+        """Manifest assumed for collections created before manifests were recorded"""
+        return self.build_manifest(self.legacy_models['image'], self.legacy_models['text'], pin=False)
+
+    def resolve(self, manifest_entry):
+        """Registry key for a manifest entry, refusing models that no longer match
+
+        A manifest revision that is a commit hash matches a configured model
+        whose revision is that commit or currently resolves to it.
+        """
+        wanted = (manifest_entry['model_name'], manifest_entry.get('revision', 'main'))
+        key = manifest_entry.get('key')
+        candidates = ([key] if key in self.specs else []) + list(self.specs)
+        for candidate in candidates:
+            spec = self.specs[candidate]
+            if (spec['model_name'], spec.get('revision', 'main')) == wanted:
+                return candidate
+        if COMMIT_HASH.fullmatch(wanted[1]):
+            changed = None
+            for candidate in dict.fromkeys(candidates):
+                spec = self.specs[candidate]
+                if spec['model_name'] != wanted[0]:
+                    continue
+                resolved = self.resolved_revision(candidate)
+                if resolved == wanted[1]:
+                    return candidate
+                changed = changed or (candidate, spec.get('revision', 'main'), resolved)
+            if changed:
+                candidate, revision, resolved = changed
+                raise ModelError(
+                    f"{wanted[0]}@{revision} now resolves to commit {resolved}, but this collection "
+                    f"was built with commit {wanted[1]}; pin '{candidate}' to revision {wanted[1]}"
+                )
+        raise ModelError(
+            f"No configured model matches {wanted[0]}@{wanted[1]}, which built this collection"
+        )
+
+
+registry = ModelRegistry(load_config())
@@ -9,39 +9,32 @@ import subprocess
 import signal
 import time
 
-def check_models_exist():
-    """Check if models are already downloaded"""
-    MODEL_CACHE_DIR = os.path.join(os.path.dirname(__file__), "models")
-    clip_cache_dir = os.path.join(MODEL_CACHE_DIR, "clip-vit-base-patch32")
-    sbert_cache_dir = os.path.join(MODEL_CACHE_DIR, "all-MiniLM-L6-v2")
-    
-    clip_exists = os.path.exists(clip_cache_dir) and os.listdir(clip_cache_dir)
-    sbert_exists = os.path.exists(sbert_cache_dir) and os.listdir(sbert_cache_dir)
-    
-    return clip_exists and sbert_exists
+import logs
+from download_models import check_models_exist
+
+log = logs.get_logger('startup')
 
 def download_models_if_needed():
     """Download models if they don't exist"""
     if not check_models_exist():
-        print("AI models not found in cache. Downloading...")
+        log.info("AI models not found in cache, downloading")
         try:
             subprocess.run([sys.executable, "download_models.py"], check=True)
-            print("Models downloaded successfully!")
+            log.info("Models downloaded successfully")
         except subprocess.CalledProcessError as e:
-            print(f"Model download failed: {e}")
+            log.error("Model download failed", extra={'error': str(e)})
             return False
     else:
-        print("Models found in cache!")
+        log.info("Models found in cache")
     return True
 
 def main():
     """Main production startup function"""
-    print("Starting FilDOS AI API")
-    print("=" * 50)
+    log.info("Starting FilDOS AI API")
     
     # Ensure models are available
     if not download_models_if_needed():
-        print("Cannot start without models!")
+        log.error("Cannot start without models")
         sys.exit(1)
     
     # Get configuration from environment
@@ -49,10 +42,7 @@ def main():
     workers = os.environ.get('WORKERS', '1')
     host = os.environ.get('HOST', '0.0.0.0')
     
-    print(f"Host: {host}")
-    print(f"Port: {port}")
-    print(f"Workers: {workers}")
-    print("=" * 50)
+    log.info("Server configuration", extra={'host': host, 'port': port, 'workers': workers})
     
     # Start Gunicorn
     cmd = [
@@ -63,8 +53,7 @@ def main():
         'app:app'
     ]
     
-    print("Starting Gunicorn server...")
-    print(f"Command: {' '.join(cmd)}")
+    log.info("Starting Gunicorn server", extra={'command': ' '.join(cmd)})
     
     try:
         # Start the server
@@ -72,12 +61,12 @@ def main():
         
         # Set up signal handlers for graceful shutdown
         def signal_handler(signum, frame):
-            print(f"\nReceived signal {signum}. Shutting down gracefully...")
+            log.info("Received signal, shutting down gracefully", extra={'signal': signum})
             process.terminate()
             try:
                 process.wait(timeout=30)
             except subprocess.TimeoutExpired:
-                print("Force killing process...")
+                log.warning("Server did not stop in time, killing it")
                 process.kill()
             sys.exit(0)
         
@@ -88,11 +77,10 @@ def main():
         process.wait()
         
     except FileNotFoundError:
-        print("Gunicorn not found! Please install it:")
-        print("   pip install gunicorn")
+        log.error("Gunicorn not found, install it with: pip install gunicorn")
         sys.exit(1)
     except Exception as e:
-        print(f"Error starting server: {e}")
+        log.error("Error starting server", extra={'error': str(e)})
         sys.exit(1)
 
 if __name__ == "__main__":
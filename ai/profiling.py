@@ -0,0 +1,173 @@
+"""
+On-demand per-request profiling for FilDOS AI API
+
+Disabled unless PROFILING_ENABLED is set. When enabled, a request opts in with
+the X-Profile header or the ?profile= query flag, using a comma-separated
+list of modes:
+
+    timing   Server-Timing header with per-stage durations
+    json     also add a "timings" field to the JSON response
+    cprofile write a cProfile dump (.prof) to PROFILE_DIR
+    torch    write a torch profiler Chrome trace (.json) to PROFILE_DIR
+
+PROFILE_DIR keeps at most PROFILE_MAX_FILES artifacts; the oldest are removed.
+Only one torch profiler can run per process; a torch request that arrives
+while another is being profiled runs without it and says so in the
+X-Profile-Skipped header.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import make_response, request
+
+import metrics
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 20))
+
+MODES = {'timing', 'json', 'cprofile', 'torch'}
+
+# Concurrent torch profilers crash inside kineto
+_torch_lock = threading.Lock()
+
+
+def requested_modes():
+    """Profiling modes asked for by the current request"""
+    raw = request.headers.get('X-Profile') or request.args.get('profile') or ''
+    modes = {m.strip().lower() for m in raw.split(',') if m.strip()}
+    if modes & {'1', 'true', 'yes'}:
+        modes.add('timing')
+    modes &= MODES
+    if modes:
+        # Every mode reports timings
+        modes.add('timing')
+    return modes
+
+
+def server_timing(timings, total):
+    """Format stage timings as a Server-Timing header value"""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts), totals
+
+
+def rotate_profiles():
+    """Delete the oldest artifacts beyond PROFILE_MAX_FILES"""
+    try:
+        entries = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+    for path in entries[:max(len(entries) - PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Another worker got there first
+
+
+def artifact_path(endpoint, suffix):
+    """Unique path in PROFILE_DIR for a new artifact"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = f"{endpoint}-{stamp}-{os.getpid()}-{uuid.uuid4().hex[:8]}{suffix}"
+    return os.path.join(PROFILE_DIR, name)
+
+
+def run_profiled(view, endpoint, modes, args, kwargs):
+    """Run a view under the requested profilers, returning (result, artifacts, skipped modes)"""
+    artifacts = []
+    skipped = []
+    profiler = cProfile.Profile() if 'cprofile' in modes else None
+    torch_profiler = None
+    torch_locked = 'torch' in modes and _torch_lock.acquire(blocking=False)
+    if 'torch' in modes and not torch_locked:
+        skipped.append('torch')
+
+    try:
+        if torch_locked:
+            import torch
+            from torch.profiler import ProfilerActivity, profile
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            torch_profiler = profile(activities=activities)
+            torch_profiler.__enter__()
+        if profiler:
+            profiler.enable()
+        try:
+            result = view(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+            if torch_profiler:
+                torch_profiler.__exit__(None, None, None)
+
+        if profiler:
+            path = artifact_path(endpoint, '.prof')
+            profiler.dump_stats(path)
+            artifacts.append(os.path.basename(path))
+        if torch_profiler:
+            path = artifact_path(endpoint, '.trace.json')
+            torch_profiler.export_chrome_trace(path)
+            artifacts.append(os.path.basename(path))
+    finally:
+        if torch_locked:
+            _torch_lock.release()
+    if artifacts:
+        rotate_profiles()
+    return result, artifacts, skipped
+
+
+def profiled(endpoint):
+    """Decorator adding opt-in profiling to a view; a no-op when profiling is disabled"""
+    def decorator(view):
+        if not PROFILING_ENABLED:
+            return view
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            modes = requested_modes()
+            if not modes:
+                return view(*args, **kwargs)
+
+            timings = []
+            token = metrics.stage_timings.set(timings)
+            start = time.perf_counter()
+            try:
+                result, artifacts, skipped = run_profiled(view, endpoint, modes, args, kwargs)
+            finally:
+                total = time.perf_counter() - start
+                metrics.stage_timings.reset(token)
+
+            response = make_response(result)
+            header, totals = server_timing(timings, total)
+            response.headers['Server-Timing'] = header
+            if artifacts:
+                response.headers['X-Profile-Artifacts'] = ", ".join(artifacts)
+            if skipped:
+                response.headers['X-Profile-Skipped'] = ", ".join(
+                    f"{mode} (already profiling another request)" for mode in skipped
+                )
+            if 'json' in modes and response.is_json:
+                body = response.get_json()
+                if isinstance(body, dict):
+                    body['timings'] = {
+                        'stages_ms': {stage: seconds * 1000 for stage, seconds in totals.items()},
+                        'total_ms': total * 1000,
+                        'artifacts': artifacts
+                    }
+                    response.set_data(json.dumps(body))
+            return response
+        return wrapper
+    return decorator
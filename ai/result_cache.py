@@ -0,0 +1,203 @@
+"""
+Search result cache for FilDOS AI API
+
+Results are cached per (collection, mode, query parameters). Every collection
+has a write version that is bumped whenever its contents change (a file is
+embedded, the collection is deleted or restored from a snapshot); entries are
+stored under the version current when the search started, so results computed
+before a write are never served after it.
+
+Each worker keeps a small in-memory LRU (RESULT_CACHE_MAX_ENTRIES) in front of
+a SQLite store at RESULT_CACHE_PATH that all workers on the host share, along
+with the write versions. Entries expire after RESULT_CACHE_TTL seconds. Set
+RESULT_CACHE_PATH to an empty string to keep the cache per worker.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import logs
+import metrics
+
+ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+TTL = float(os.environ.get('RESULT_CACHE_TTL', 300))
+MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1000))
+SHARED_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_SHARED_MAX_ENTRIES', 20000))
+STORE_PATH = os.environ.get(
+    'RESULT_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'fildos-result-cache.sqlite')
+)
+
+log = logs.get_logger('cache')
+
+# Trim the shared store every this many inserts
+TRIM_INTERVAL = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (collection TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at);
+-- bump() deletes a collection's entries after every embedded file
+CREATE INDEX IF NOT EXISTS results_collection ON results (collection);
+"""
+
+
+class ResultCache:
+    def __init__(self, store_path=STORE_PATH, ttl=TTL, max_entries=MAX_ENTRIES,
+                 shared_max_entries=SHARED_MAX_ENTRIES):
+        self.store_path = store_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared_max_entries = shared_max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._local = threading.local()
+        self._inserts = 0
+
+    def _store(self):
+        """This thread's connection to the shared store, or None if sharing is off"""
+        if not self.store_path:
+            return None
+        local = self._local
+        # Connections must not cross fork
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.store_path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def version(self, collection):
+        """Current write version of a collection"""
+        store = self._store()
+        if store is None:
+            return self._versions.get(collection, 0)
+        row = store.execute('SELECT version FROM versions WHERE collection = ?', (collection,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, collection):
+        """Invalidate every cached result for a collection"""
+        store = self._store()
+        with self._lock:
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+            for key in [key for key in self._entries if key[0] == collection]:
+                del self._entries[key]
+        if store is not None:
+            store.execute(
+                'INSERT INTO versions (collection, version) VALUES (?, 1) '
+                'ON CONFLICT(collection) DO UPDATE SET version = version + 1',
+                (collection,)
+            )
+            store.execute('DELETE FROM results WHERE collection = ?', (collection,))
+
+    def key(self, collection, mode, params):
+        """Cache key for a lookup, including the collection's current write version"""
+        return (collection, self.version(collection), mode, json.dumps(params, sort_keys=True))
+
+    def get(self, key):
+        """Cached value for a key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    metrics.record_cache_lookup('search_results', True)
+                    return entry[0]
+                del self._entries[key]
+
+        store = self._store()
+        if store is not None:
+            row = store.execute(
+                'SELECT value, expires_at FROM results WHERE key = ? AND expires_at > ?',
+                (json.dumps(key), time.time())
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, now + (row[1] - time.time()))
+                metrics.record_cache_lookup('search_results', True)
+                return value
+
+        metrics.record_cache_lookup('search_results', False)
+        return None
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key, value):
+        """Cache a value under a key from key()"""
+        self._remember(key, value, time.monotonic() + self.ttl)
+        store = self._store()
+        if store is None:
+            return
+        store.execute(
+            'INSERT OR REPLACE INTO results (key, collection, value, expires_at) VALUES (?, ?, ?, ?)',
+            (json.dumps(key), key[0], json.dumps(value), time.time() + self.ttl)
+        )
+        self._inserts += 1
+        if self._inserts % TRIM_INTERVAL == 0:
+            self._trim(store)
+
+    def _trim(self, store):
+        """Drop expired entries, then the ones closest to expiry over the size limit"""
+        store.execute('DELETE FROM results WHERE expires_at <= ?', (time.time(),))
+        store.execute(
+            'DELETE FROM results WHERE key IN ('
+            'SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+            (self.shared_max_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        store = self._store()
+        if store is not None:
+            store.execute('DELETE FROM results')
+
+
+cache = ResultCache()
+
+
+def cached(collection, mode, params, compute):
+    """Return compute() through the cache; compute runs on a miss"""
+    if not ENABLED:
+        return compute()
+    try:
+        key = cache.key(collection, mode, params)
+        value = cache.get(key)
+    except sqlite3.Error as e:
+        log.warning("Result cache unavailable", extra={'error': str(e)})
+        return compute()
+    if value is not None:
+        return value
+    value = compute()
+    try:
+        cache.put(key, value)
+    except sqlite3.Error as e:
+        log.warning("Error storing cached result", extra={'error': str(e)})
+    return value
+
+
+def invalidate(collection):
+    """Bump a collection's write version after its contents changed"""
+    try:
+        cache.bump(collection)
+    except sqlite3.Error as e:
+        log.error("Error invalidating result cache", extra={'collection': collection, 'error': str(e)})
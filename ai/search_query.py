@@ -0,0 +1,145 @@
+"""
+Search filters and cursor pagination for FilDOS AI API
+
+Filters are pushed down into the Weaviate query, so only matching files are
+scored:
+    type              image, text or all (default)
+    created_after     ISO 8601 bounds on when the file was embedded;
+    created_before    a timestamp without a time zone is taken as UTC
+    filename_pattern  wildcard match on the filename (* and ?)
+
+Pages are cut from a ranking ordered by score, then object id, so the order
+is the same on every request. A first page fetches only one result more than
+it serves, to tell whether another page follows. Once a client pages, the
+ranking is fetched SEARCH_WINDOW results at a time and cached with the search
+results (see result_cache.py): the next pages are sliced from the cached
+ranking instead of re-scoring the collection, and only a page past the window
+fetches a deeper one.
+
+A cursor records the last result served. The next page starts strictly
+after it, so a result is never served twice even if a deeper fetch shifts
+the ranking. Searches stop after SEARCH_MAX_RESULTS results.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+from weaviate.classes.query import Filter
+
+SEARCH_WINDOW = int(os.environ.get('SEARCH_WINDOW', 50))
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))
+
+FILE_TYPES = ('image', 'text')
+
+
+class FilterError(ValueError):
+    """A filter the collection cannot apply"""
+
+
+def _parse_timestamp(name, value):
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 timestamp")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_filters(data):
+    """Validated filters from request data; raises ValueError"""
+    file_type = str(data.get('type') or 'all').lower()
+    if file_type not in FILE_TYPES + ('all',):
+        raise ValueError("type must be image, text or all")
+    filters = {'type': file_type}
+
+    bounds = {}
+    for name in ('created_after', 'created_before'):
+        if data.get(name):
+            bounds[name] = _parse_timestamp(name, data[name])
+            filters[name] = bounds[name].isoformat()
+    if len(bounds) == 2 and bounds['created_after'] > bounds['created_before']:
+        raise ValueError("created_after must not be later than created_before")
+
+    if data.get('filename_pattern'):
+        filters['filename_pattern'] = str(data['filename_pattern'])
+    return filters
+
+
+def file_types(filters):
+    """File types a search has to query"""
+    return FILE_TYPES if filters['type'] == 'all' else (filters['type'],)
+
+
+def weaviate_filter(filters, file_type, property_names):
+    """Weaviate filter for the files of one type; raises FilterError"""
+    conditions = [Filter.by_property('type').equal(file_type)]
+    if 'created_after' in filters or 'created_before' in filters:
+        if 'created_at' not in property_names:
+            raise FilterError("This collection was created before created_at was recorded; "
+                              "created_after and created_before are not supported")
+        if 'created_after' in filters:
+            conditions.append(Filter.by_property('created_at').greater_or_equal(
+                datetime.fromisoformat(filters['created_after'])))
+        if 'created_before' in filters:
+            conditions.append(Filter.by_property('created_at').less_or_equal(
+                datetime.fromisoformat(filters['created_before'])))
+    if 'filename_pattern' in filters:
+        conditions.append(Filter.by_property('filename').like(filters['filename_pattern']))
+    return Filter.all_of(conditions) if len(conditions) > 1 else conditions[0]
+
+
+def rank(results):
+    """Sort results into the stable page order: best score first, ties by id"""
+    return sorted(results, key=lambda r: (-r['score'], r['id']))
+
+
+def window_depth(served, page_size):
+    """How deep the ranking must be to serve the next page and tell if another follows"""
+    needed = served + page_size + 1
+    if not served:
+        # Most searches never page, so a first page fetches no more than it needs
+        return min(SEARCH_MAX_RESULTS, needed)
+    return min(SEARCH_MAX_RESULTS, math.ceil(needed / SEARCH_WINDOW) * SEARCH_WINDOW)
+
+
+def search_key(collection_name, query, filters):
+    """Short fingerprint binding a cursor to one search"""
+    encoded = json.dumps([collection_name, query, filters], sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def encode_cursor(key, served, last):
+    """Opaque cursor for the page after the result last"""
+    payload = {'k': key, 'n': served, 's': last['score'], 'id': last['id']}
+    encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    return encoded.decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, key):
+    """Position encoded in a cursor; raises ValueError if it is invalid or from another search"""
+    try:
+        padded = str(cursor) + '=' * (-len(str(cursor)) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        position = {'n': int(payload['n']), 's': float(payload['s']), 'id': str(payload['id'])}
+        cursor_key = payload['k']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if cursor_key != key:
+        raise ValueError("cursor belongs to a different query, collection or filters")
+    return position
+
+
+def page_after(ranking, page_size, position=None):
+    """The page_size results after a cursor position, and whether more follow"""
+    start = 0
+    if position is not None:
+        after = (-position['s'], position['id'])
+        while start < len(ranking) and (-ranking[start]['score'], ranking[start]['id']) <= after:
+            start += 1
+    return ranking[start:start + page_size], start + page_size < len(ranking)
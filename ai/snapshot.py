@@ -0,0 +1,295 @@
+"""
+Binary snapshots of Weaviate collections
+
+A snapshot holds everything needed to rebuild a collection without
+re-downloading or re-embedding files. Layout (little endian):
+
+    MAGIC
+    column data, each column aligned to 64 bytes:
+        one N x dim array per named vector (float16 or float32)
+        object ids, N x 16 bytes
+        properties, one JSON object per line
+    footer JSON: format version, collection, model manifest, count, dtype,
+                 column offsets and a SHA-256 of everything before the footer
+    footer length (uint64)
+    MAGIC
+
+Vector columns can be memory-mapped with numpy straight from the file.
+Export streams objects with cursor pagination and writes each column to a
+temporary file, so memory stays bounded; import streams rows back through
+batch inserts.
+
+Usage (from the ai/ directory):
+    python snapshot.py export MyFiles myfiles.fsnap [--dtype float16]
+    python snapshot.py import myfiles.fsnap MyFilesCopy
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+
+MAGIC = b"FILDOSNP"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+CHUNK_SIZE = 1024 * 1024
+DTYPES = ('float16', 'float32')
+VECTOR_NAMES = ('image_vector', 'text_vector')
+
+
+class SnapshotError(Exception):
+    """The snapshot file is malformed or does not match its checksum"""
+
+
+def _pad(out, digest):
+    """Pad the output to the next ALIGNMENT boundary"""
+    padding = -out.tell() % ALIGNMENT
+    if padding:
+        zeros = b"\0" * padding
+        out.write(zeros)
+        digest.update(zeros)
+
+
+def _json_value(value):
+    """JSON encoding for property values json cannot encode, such as DATE properties"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _copy_column(source_path, out, digest):
+    """Append a column file to the snapshot, returning its (offset, nbytes)"""
+    _pad(out, digest)
+    offset = out.tell()
+    with open(source_path, 'rb') as source:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            out.write(chunk)
+            digest.update(chunk)
+    return offset, out.tell() - offset
+
+
+def export_collection(collection, collection_name, manifest, path, dtype='float32', page_size=1000):
+    """Write a collection to a snapshot file and return its footer"""
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+    dimensions = {
+        'image_vector': manifest['image']['dimension'],
+        'text_vector': manifest['text']['dimension'],
+    }
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as work_dir:
+        column_paths = {name: os.path.join(work_dir, name) for name in VECTOR_NAMES}
+        column_paths['ids'] = os.path.join(work_dir, 'ids')
+        column_paths['properties'] = os.path.join(work_dir, 'properties')
+        columns = {name: open(column_path, 'wb') for name, column_path in column_paths.items()}
+        count = 0
+        try:
+            after = None
+            while True:
+                with metrics.time_stage('vector_scan'):
+                    response = collection.query.fetch_objects(limit=page_size, after=after, include_vector=True)
+                objects = response.objects
+                if not objects:
+                    break
+                for name in VECTOR_NAMES:
+                    rows = np.zeros((len(objects), dimensions[name]), dtype=dtype)
+                    for i, obj in enumerate(objects):
+                        vector = obj.vector.get(name)
+                        if vector:
+                            rows[i] = vector
+                    columns[name].write(rows.tobytes())
+                columns['ids'].write(b"".join(uuid.UUID(str(obj.uuid)).bytes for obj in objects))
+                columns['properties'].write(b"".join(
+                    json.dumps(obj.properties, default=_json_value).encode('utf-8') + b"\n" for obj in objects
+                ))
+                count += len(objects)
+                after = objects[-1].uuid
+                if len(objects) < page_size:
+                    break
+        finally:
+            for column in columns.values():
+                column.close()
+
+        digest = hashlib.sha256()
+        layout = {}
+        with open(path, 'wb') as out:
+            out.write(MAGIC)
+            digest.update(MAGIC)
+            for name, column_path in column_paths.items():
+                layout[name] = _copy_column(column_path, out, digest)
+            footer = {
+                'format_version': FORMAT_VERSION,
+                'collection': collection_name,
+                'manifest': manifest,
+                'count': count,
+                'dtype': dtype,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'vectors': {
+                    name: {'offset': layout[name][0], 'nbytes': layout[name][1], 'dimension': dimensions[name]}
+                    for name in VECTOR_NAMES
+                },
+                'ids': {'offset': layout['ids'][0], 'nbytes': layout['ids'][1]},
+                'properties': {'offset': layout['properties'][0], 'nbytes': layout['properties'][1]},
+                'sha256': digest.hexdigest(),
+            }
+            encoded = json.dumps(footer).encode('utf-8')
+            out.write(encoded)
+            out.write(struct.pack('<Q', len(encoded)))
+            out.write(MAGIC)
+    return footer
+
+
+class Snapshot:
+    """Read access to a snapshot file; vector columns are memory-mapped"""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        size = os.path.getsize(path)
+        if size < 2 * len(MAGIC) + 8:
+            raise SnapshotError("Not a FilDOS snapshot")
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise SnapshotError("Not a FilDOS snapshot")
+            f.seek(size - len(MAGIC) - 8)
+            (footer_length,) = struct.unpack('<Q', f.read(8))
+            if f.read(len(MAGIC)) != MAGIC:
+                raise SnapshotError("Snapshot is truncated")
+            self.footer_offset = size - len(MAGIC) - 8 - footer_length
+            if self.footer_offset < len(MAGIC):
+                raise SnapshotError("Snapshot is truncated")
+            f.seek(self.footer_offset)
+            try:
+                self.footer = json.loads(f.read(footer_length))
+            except ValueError:
+                raise SnapshotError("Snapshot footer is corrupt")
+        if self.footer.get('format_version') != FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot format {self.footer.get('format_version')}")
+        if verify:
+            self.verify()
+
+    @property
+    def count(self):
+        return self.footer['count']
+
+    @property
+    def manifest(self):
+        return self.footer['manifest']
+
+    def verify(self):
+        """Check the SHA-256 of the data section"""
+        digest = hashlib.sha256()
+        remaining = self.footer_offset
+        with open(self.path, 'rb') as f:
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        if digest.hexdigest() != self.footer['sha256']:
+            raise SnapshotError("Snapshot checksum mismatch")
+
+    def vectors(self, name):
+        """Memory-mapped N x dim array for a named vector"""
+        column = self.footer['vectors'][name]
+        return np.memmap(self.path, dtype=self.footer['dtype'], mode='r',
+                         offset=column['offset'], shape=(self.count, column['dimension']))
+
+    def ids(self):
+        column = self.footer['ids']
+        return np.memmap(self.path, dtype=np.uint8, mode='r',
+                         offset=column['offset'], shape=(self.count, 16))
+
+    def properties(self):
+        """Yield each object's properties in order"""
+        column = self.footer['properties']
+        with open(self.path, 'rb') as f:
+            f.seek(column['offset'])
+            remaining = column['nbytes']
+            buffer = b""
+            while remaining or buffer:
+                if remaining:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    remaining -= len(chunk)
+                    buffer += chunk
+                lines = buffer.split(b"\n")
+                buffer = lines.pop() if remaining else b""
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+
+    def rows(self):
+        """Yield (uuid, properties, {vector_name: list}) for every object"""
+        if not self.count:
+            return
+        vectors = {name: self.vectors(name) for name in VECTOR_NAMES}
+        ids = self.ids()
+        for i, properties in enumerate(self.properties()):
+            yield (
+                str(uuid.UUID(bytes=ids[i].tobytes())),
+                properties,
+                {name: vectors[name][i].astype(np.float32).tolist() for name in VECTOR_NAMES}
+            )
+
+
+def import_snapshot(collection, snapshot, batch_size=500, concurrent_requests=2):
+    """Insert every object of a snapshot with batch inserts, keeping object ids"""
+    inserted = 0
+    with metrics.time_stage('weaviate_insert'):
+        with collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+            for object_id, properties, vector in snapshot.rows():
+                batch.add_object(properties=properties, vector=vector, uuid=object_id)
+                inserted += 1
+    failed = collection.batch.failed_objects
+    return {'inserted': inserted - len(failed), 'failed': len(failed)}
+
+
+def main():
+    """Export or import a collection from the command line"""
+    parser = argparse.ArgumentParser(description="Export or import FilDOS collection snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='write a collection to a snapshot file')
+    export_parser.add_argument('collection')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--dtype', choices=DTYPES, default='float32')
+    import_parser = commands.add_parser('import', help='restore a snapshot into a new collection')
+    import_parser.add_argument('path')
+    import_parser.add_argument('collection', nargs='?', help='defaults to the exported collection name')
+    args = parser.parse_args()
+
+    import app
+
+    start = time.time()
+    if args.command == 'export':
+        manifest = app.get_collection_manifest(args.collection)
+        if manifest is None:
+            raise SystemExit(f"Collection {args.collection} not found")
+        footer = export_collection(app.weaviate_client.collections.get(args.collection),
+                                   args.collection, manifest, args.path, args.dtype)
+        print(f"Exported {footer['count']} objects to {args.path} in {time.time() - start:.1f}s")
+    else:
+        snapshot = Snapshot(args.path)
+        collection_name = args.collection or snapshot.footer['collection']
+        if app.weaviate_client.collections.exists(collection_name):
+            raise SystemExit(f"Collection {collection_name} already exists")
+        if not app.create_weaviate_collection(collection_name, snapshot.manifest):
+            raise SystemExit(f"Failed to create collection {collection_name}")
+        result = import_snapshot(app.weaviate_client.collections.get(collection_name), snapshot)
+        print(f"Imported {result['inserted']} objects into {collection_name} "
+              f"({result['failed']} failed) in {time.time() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+"""
+Per-worker Weaviate connection for FilDOS AI API
+
+The client is created lazily on first use in each worker process, never in
+the gunicorn master, so gRPC channels are not shared across fork. It keeps
+one pooled HTTP session and gRPC channel per worker (WEAVIATE_POOL_CONNECTIONS,
+WEAVIATE_POOL_MAXSIZE) with short connect and query timeouts.
+
+A circuit breaker guards the connection: a failed connect, or
+WEAVIATE_FAILURE_THRESHOLD consecutive connection errors, opens it and drops
+the client. While open, requests fail fast with WeaviateUnavailable. After a
+backoff (WEAVIATE_RETRY_SECONDS doubling up to WEAVIATE_RETRY_MAX_SECONDS,
+with jitter) a single request reconnects; everyone else keeps failing fast
+until it succeeds, so a Weaviate restart does not cause a reconnect storm.
+
+With WEAVIATE_ASYNC=true, fan_out() runs independent queries concurrently on
+an async client driven by a per-worker event loop thread.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import weaviate
+from weaviate.classes.init import AdditionalConfig, Auth, Timeout
+from weaviate.config import ConnectionConfig
+from weaviate.exceptions import (
+    WeaviateClosedClientError,
+    WeaviateConnectionError,
+    WeaviateGRPCUnavailableError,
+    WeaviateQueryError,
+    WeaviateRetryError,
+    WeaviateStartUpError,
+    WeaviateTimeoutError,
+)
+
+import logs
+import metrics
+
+POOL_CONNECTIONS = int(os.environ.get('WEAVIATE_POOL_CONNECTIONS', 20))
+POOL_MAXSIZE = int(os.environ.get('WEAVIATE_POOL_MAXSIZE', 100))
+INIT_TIMEOUT = float(os.environ.get('WEAVIATE_INIT_TIMEOUT', 2))
+QUERY_TIMEOUT = float(os.environ.get('WEAVIATE_QUERY_TIMEOUT', 30))
+INSERT_TIMEOUT = float(os.environ.get('WEAVIATE_INSERT_TIMEOUT', 90))
+FAILURE_THRESHOLD = int(os.environ.get('WEAVIATE_FAILURE_THRESHOLD', 3))
+RETRY_SECONDS = float(os.environ.get('WEAVIATE_RETRY_SECONDS', 1))
+RETRY_MAX_SECONDS = float(os.environ.get('WEAVIATE_RETRY_MAX_SECONDS', 30))
+ASYNC_ENABLED = os.environ.get('WEAVIATE_ASYNC', 'false').lower() == 'true'
+
+log = logs.get_logger('weaviate')
+
+CONNECTION_ERRORS = (
+    WeaviateClosedClientError,
+    WeaviateConnectionError,
+    WeaviateGRPCUnavailableError,
+    WeaviateRetryError,
+    WeaviateStartUpError,
+    WeaviateTimeoutError,
+    # An async fan_out that did not finish within the query timeout
+    concurrent.futures.TimeoutError,
+)
+
+
+class WeaviateUnavailable(Exception):
+    """Weaviate is down and the circuit breaker is failing requests fast"""
+
+
+def is_connection_error(error):
+    """True if an exception means Weaviate could not be reached, not that the request was bad"""
+    if isinstance(error, CONNECTION_ERRORS):
+        return True
+    # gRPC transport failures surface as query errors
+    if isinstance(error, WeaviateQueryError):
+        return 'UNAVAILABLE' in str(error) or 'DEADLINE_EXCEEDED' in str(error)
+    return False
+
+
+class CircuitBreaker:
+    """Closed, open or half-open; opened by connection failures, closed by a successful probe"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, retry_seconds=RETRY_SECONDS,
+                 retry_max_seconds=RETRY_MAX_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.retry_seconds = retry_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        # Bumped on every trip; failures of calls started before it are stale
+        self.generation = 0
+
+    @property
+    def state(self):
+        if self.trips == 0:
+            return 'closed'
+        return 'open' if time.monotonic() < self.retry_at else 'half_open'
+
+    def retry_after(self):
+        """Seconds until the next reconnect attempt"""
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def record_success(self):
+        if not (self.failures or self.trips):
+            return
+        with self._lock:
+            self.failures = 0
+            self.trips = 0
+        metrics.WEAVIATE_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self, trip=False, generation=None):
+        """Count a connection failure; returns True if the breaker opened
+
+        Calls pass the generation they started in. Once the breaker has
+        tripped, failures of calls that were already in flight are ignored so
+        they do not push the retry further out; only the reconnect probe
+        (trip=True) extends the backoff.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self.failures += 1
+            if not trip and self.trips == 0 and self.failures < self.failure_threshold:
+                return False
+            # Exponential backoff with jitter so workers do not retry in lockstep
+            backoff = min(self.retry_max_seconds, self.retry_seconds * 2 ** self.trips)
+            self.retry_at = time.monotonic() + backoff * random.uniform(0.5, 1.0)
+            self.trips += 1
+            self.generation += 1
+        metrics.WEAVIATE_CIRCUIT_OPEN.set(1)
+        return True
+
+
+class WeaviateConnection:
+    """Lazily connected, fork-safe stand-in for a WeaviateClient
+
+    Attribute access is forwarded to the worker's client, so it can be used
+    like one (weaviate_client.collections.get(...)). It is falsy while
+    Weaviate cannot be reached.
+    """
+
+    def __init__(self, url, api_key=None):
+        self.url = url
+        self.api_key = api_key
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.close)
+
+    def _reset(self):
+        """Forget the parent's client after fork; its sockets belong to the parent"""
+        self._client = None
+        self._connect_lock = threading.Lock()
+        self.breaker = CircuitBreaker()
+        self._loop = None
+        self._async_client = None
+        self._async_lock = threading.Lock()
+
+    def _additional_config(self):
+        return AdditionalConfig(
+            connection=ConnectionConfig(
+                session_pool_connections=POOL_CONNECTIONS,
+                session_pool_maxsize=POOL_MAXSIZE
+            ),
+            timeout=Timeout(init=INIT_TIMEOUT, query=QUERY_TIMEOUT, insert=INSERT_TIMEOUT)
+        )
+
+    def _connect_args(self):
+        if self.api_key:
+            return {
+                'cluster_url': self.url,
+                'auth_credentials': Auth.api_key(self.api_key),
+                'additional_config': self._additional_config()
+            }
+        # Parse host and port from URL for local connection
+        parsed_url = urlparse(self.url)
+        return {
+            'host': parsed_url.hostname or 'localhost',
+            'port': parsed_url.port or 8080,
+            'additional_config': self._additional_config()
+        }
+
+    def _connect(self):
+        if self.api_key:
+            return weaviate.connect_to_weaviate_cloud(**self._connect_args())
+        return weaviate.connect_to_local(**self._connect_args())
+
+    def client(self):
+        """Return this worker's client, connecting if needed; raises WeaviateUnavailable"""
+        client = self._client
+        if client is not None:
+            return client
+
+        state = self.breaker.state
+        if state == 'open':
+            raise WeaviateUnavailable(f"Weaviate unavailable, retrying in {self.breaker.retry_after():.0f}s")
+        # Half-open: one request probes, the rest fail fast. Closed: wait for the connect in progress.
+        if not self._connect_lock.acquire(blocking=state == 'closed'):
+            raise WeaviateUnavailable("Weaviate unavailable, reconnecting")
+        try:
+            if self._client is None:
+                if self.breaker.state == 'open':
+                    # The connect we waited for failed
+                    raise WeaviateUnavailable(f"Weaviate unavailable, retrying in {self.breaker.retry_after():.0f}s")
+                try:
+                    self._client = self._connect()
+                except Exception as e:
+                    self.breaker.record_failure(trip=True)
+                    log.error("Error connecting to Weaviate", extra={
+                        'url': self.url, 'error': str(e), 'retry_after_seconds': round(self.breaker.retry_after(), 1)
+                    })
+                    raise WeaviateUnavailable(f"Weaviate unavailable: {e}") from e
+                self.breaker.record_success()
+                log.info("Connected to Weaviate", extra={'url': self.url, 'pid': os.getpid()})
+            return self._client
+        finally:
+            self._connect_lock.release()
+
+    def _drop_client(self):
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+        async_client, self._async_client = self._async_client, None
+        if async_client is not None:
+            asyncio.run_coroutine_threadsafe(async_client.close(), self._loop)
+
+    @contextmanager
+    def guard(self):
+        """Record the outcome of Weaviate calls made inside the block
+
+        Connection errors are re-raised as WeaviateUnavailable, so callers
+        answer 503 instead of mistaking an outage for an empty result.
+        """
+        generation = self.breaker.generation
+        try:
+            yield
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            if self.breaker.record_failure(generation=generation):
+                log.warning("Weaviate connection failing, circuit open", extra={
+                    'error': str(e), 'retry_after_seconds': round(self.breaker.retry_after(), 1)
+                })
+                self._drop_client()
+            raise WeaviateUnavailable(f"Weaviate unavailable: {e}") from e
+        self.breaker.record_success()
+
+    def __getattr__(self, name):
+        return getattr(self.client(), name)
+
+    def __bool__(self):
+        try:
+            self.client()
+            return True
+        except WeaviateUnavailable:
+            return False
+
+    def status(self):
+        """Connection state for the health endpoint"""
+        return {
+            'connected': self._client is not None,
+            'circuit': self.breaker.state,
+            'retry_after_seconds': round(self.breaker.retry_after(), 1),
+            'async': ASYNC_ENABLED,
+        }
+
+    def close(self):
+        self._drop_client()
+
+    def _event_loop(self):
+        """Event loop thread owning this worker's async client"""
+        with self._async_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='weaviate-async', daemon=True).start()
+            return self._loop
+
+    async def _gather(self, queries):
+        if self._async_client is None:
+            if self.api_key:
+                client = weaviate.use_async_with_weaviate_cloud(**self._connect_args())
+            else:
+                client = weaviate.use_async_with_local(**self._connect_args())
+            await client.connect()
+            self._async_client = client
+        return await asyncio.gather(*(
+            getattr(self._async_client.collections.get(collection_name).query, method)(**kwargs)
+            for collection_name, method, kwargs in queries
+        ))
+
+    def fan_out(self, queries):
+        """Run [(collection_name, query_method, kwargs), ...] and return the responses in order
+
+        Queries run concurrently on the async client when WEAVIATE_ASYNC is set,
+        one after another on the sync client otherwise.
+        """
+        with self.guard():
+            if not ASYNC_ENABLED:
+                client = self.client()
+                return [
+                    getattr(client.collections.get(collection_name).query, method)(**kwargs)
+                    for collection_name, method, kwargs in queries
+                ]
+            if self.breaker.state == 'open':
+                raise WeaviateUnavailable(f"Weaviate unavailable, retrying in {self.breaker.retry_after():.0f}s")
+            future = asyncio.run_coroutine_threadsafe(self._gather(queries), self._event_loop())
+            timeout = INIT_TIMEOUT + QUERY_TIMEOUT
+            try:
+                return future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                # Stop the queries still running on the event loop; guard counts the timeout
+                future.cancel()
+                raise concurrent.futures.TimeoutError(f"queries took longer than {timeout:g}s") from None